@@ -2,7 +2,12 @@
 from OpenGL.GL import *
 from OpenGL.GLUT import *
 from OpenGL.GLU import *
-import math, time, sys, random
+import argparse, atexit, math, time, sys, ctypes
+from collections import OrderedDict
+
+import numpy as np
+
+import profiler, replay, rewind, sim
 
 # ---------------------------
 # Window settings
@@ -12,51 +17,20 @@ WINDOW_HEIGHT = 800
 ASPECT = WINDOW_WIDTH / WINDOW_HEIGHT
 
 # ---------------------------
-# Game physics
-# ---------------------------
-gravity = -500.0
-jump_strength = 250.0
-max_jump_duration = 0.35
-
-# ---------------------------
-# Ball properties
+# Camera / frame timing
 # ---------------------------
-ball_radius = 15.0
-ball_pos = [0.0, 0.0, ball_radius]
-ball_vel = [0.0, 0.0, 0.0]
-jumping = False
-jump_start_time = 0.0
-
-# ---------------------------
-# Game state
-# ---------------------------
-score = 0
-lives = 3
-game_over = False
-game_won = False
-last_tile = None
-time_on_tile = 0.0
-max_tile_time = 5
-show_timer = False
 time_last = time.time()
-move_keys = {"a": False, "d": False, "w": False, "s": False}
-space_pressed = False
-difficulty_timer = None
-difficulty_mode = False
+target_fps = 60
+idle_fps = 10            # menu, help, game over, win and pause screens
+next_frame_time = None   # perf_counter() deadline of the next frame
+missed_deadlines = 0     # frames that started more than one interval late
+rewind_speed = 2.0       # seconds of history scrubbed per second B is held
+rewinding = False
 camera_distance = 500.0
 camera_angle = 45
 camera_height = 300.0
 wall_height = 80.0
 
-# ---------------------------
-# Grid settings
-# ---------------------------
-grid_size_x = 30
-grid_size_y = 20
-tile_size = 60
-half_size_x = grid_size_x * tile_size / 2
-half_size_y = grid_size_y * tile_size / 2
-
 # ---------------------------
 # Themes
 # ---------------------------
@@ -76,228 +50,162 @@ theme_colors = {
 }
 
 # ---------------------------
-# Game objects
+# Camera mode
 # ---------------------------
-obstacles = []
-collectibles = []
-special_points = []
-holes = set()
-speed_multiplier = 1.0
+camera_mode = "follow"  # "follow", "overhead", "first_person"
 
 # ---------------------------
-# Power-ups
+# Particles
 # ---------------------------
-shields = [{'pos': [200, 200, 15], 'collected': False}, {'pos': [-200, -200, 15], 'collected': False}]
-shield_active = False
-shield_time = 0
+# Fixed-capacity ring buffer in structure-of-arrays form.  New particles
+# overwrite the oldest slots; a slot is alive while its life is above zero.
+# Life counts update_particles() calls, one per rendered frame while playing,
+# and alpha fades over the last 30 of them.  A new level
+# (sim.state.level_version) clears the buffer.
+PARTICLE_CAPACITY = 4096
+particle_pos = np.zeros((PARTICLE_CAPACITY, 3), dtype=np.float32)
+particle_vel = np.zeros((PARTICLE_CAPACITY, 3), dtype=np.float32)
+particle_color = np.zeros((PARTICLE_CAPACITY, 4), dtype=np.float32)
+particle_size = np.zeros(PARTICLE_CAPACITY, dtype=np.float32)
+particle_life = np.zeros(PARTICLE_CAPACITY, dtype=np.float32)
+particle_head = 0
+particle_trail_rate = 0.3  # trail particles emitted per frame (may exceed 1)
+particle_level = None      # sim.state.level_version the live particles belong to
+particle_rng = np.random.default_rng()
 
 # ---------------------------
-# Moving platforms
+# Lighting / Skybox
 # ---------------------------
-moving_platforms = [
-    {'pos': [0, 0, 25], 'size': [80, 30, 8], 'vel': [60, 0, 0], 'limits': [-250, 250]},
-    {'pos': [150, -150, 30], 'size': [50, 50, 8], 'vel': [0, 60, 0], 'limits': [-200, 200]},
-]
+light_position = [0.0, 0.0, 500.0, 1.0]   # <-- FIX: must be length 4
+light_color = [1.0, 1.0, 1.0, 1.0]
+ambient_light = [0.3, 0.3, 0.3, 1.0]
+skybox_size = 2000
+
+font = GLUT_BITMAP_HELVETICA_18
+mono_font = GLUT_BITMAP_9_BY_15  # column-aligned tables (profiler overlay)
 
 # ---------------------------
-# Teleporters
+# Floor cache
 # ---------------------------
-teleporters = [
-    {'pos': [300, 300, 15], 'target': [-300, -300, 15]},
-    {'pos': [-300, 300, 15], 'target': [300, -300, 15]},
-]
+# The floor is split into FLOOR_CHUNK x FLOOR_CHUNK tile chunks, each its own
+# vertex buffer with 8 vertices (two quads) per tile, xyz + rgb floats each.
+# Holes use the second quad for their depth; solid tiles collapse it to a
+# point.  A chunk is built the first time it comes within floor_view_distance
+# of the camera, and the least recently drawn ones are freed past
+# FLOOR_MAX_CHUNKS.  All chunks are dropped when holes are regenerated or the
+# theme changes; sim.set_hole() patches only the affected tile.
+FLOOR_CHUNK = 32
+FLOOR_MAX_CHUNKS = 64
+FLOOR_VERTS_PER_TILE = 8
+FLOOR_STRIDE = 6 * 4
+floor_view_distance = 3000.0  # matches the far clip plane
+floor_chunks = OrderedDict()  # (ci, cj) -> [vbo, vertex_count]
+floor_key = None
+camera_eye = [0.0, 0.0, 0.0]  # set by setup_scene()
 
 # ---------------------------
-# Speed boosts / slows / etc.
+# Mesh cache
 # ---------------------------
-speed_boosts = [
-    {'pos': [150, 150, 15], 'active': True, 'duration': 5.0},
-    {'pos': [-150, -150, 15], 'active': True, 'duration': 5.0},
-]
-speed_boost_active = False
-speed_boost_timer = 0.0
-
-slow_traps = [
-    {'pos': [150, -150, 15], 'active': True, 'duration': 3.0},
-    {'pos': [-150, 150, 15], 'active': True, 'duration': 3.0},
-]
-slow_trap_active = False
-slow_trap_timer = 0.0
-
-time_bonuses = [
-    {'pos': [250, 250, 15], 'active': True, 'time': 3.0},
-    {'pos': [-250, -250, 15], 'active': True, 'time': 3.0},
-]
-
-life_collectibles = [
-    {'pos': [300, 0, 15], 'active': True},
-    {'pos': [-300, 0, 15], 'active': True},
-]
-
-multipliers = [
-    {'pos': [0, 300, 15], 'active': True, 'duration': 10.0, 'factor': 2},
-]
-multiplier_active = False
-multiplier_timer = 0.0
-multiplier_factor = 1
+# Display lists compiled once in init_gl().  Obstacle meshes are unit sized and
+# scaled per instance; entities are grouped by type once per level so each
+# type is drawn as one run of glCallList calls.
+mesh_lists = {}
+mesh_groups = {}   # 'collectibles'/'obstacles' -> {shape: rows}, 'special_points' -> rows
+mesh_bounds = {}   # (group, shape) or 'special_points' -> (centres (n, 3), radii (n,))
+mesh_groups_key = None
+
+# Power-up cube (colour, size) by sim.PICKUP_* kind
+POWER_UP_LOOK = (
+    ((0.0, 0.0, 1.0), 15),   # speed boost
+    ((1.0, 0.0, 1.0), 15),   # slow trap
+    ((0.5, 0.5, 0.0), 15),   # time bonus
+    ((1.0, 0.0, 0.0), 20),   # life
+    ((1.0, 1.0, 0.0), 18),   # multiplier
+    ((0.0, 1.0, 1.0), 25),   # shield
+)
 
 # ---------------------------
-# Level progression
+# Level of detail
 # ---------------------------
-level = 1
-max_level = 10
+# Curved meshes are compiled at each tessellation in LOD_SLICES; mesh_lods
+# maps a mesh name to its lists, finest first.  The level is picked from the
+# projected radius in pixels: the coarsest tessellation whose silhouette stays
+# within LOD_MAX_ERROR pixels of a true circle.  A level only changes once the
+# size leaves the band LOD_HYSTERESIS around a threshold, so objects near a
+# boundary do not flicker between meshes.
+LOD_SLICES = (32, 16, 8)
+LOD_MAX_ERROR = 0.5
+LOD_HYSTERESIS = 0.15
+# Radius (px) below which level k + 1 is good enough: r * (1 - cos(pi / n)) <= error
+LOD_PIXELS = tuple(LOD_MAX_ERROR / (1.0 - math.cos(math.pi / n)) for n in LOD_SLICES[1:])
+mesh_lods = {}
+mesh_lod_levels = {}  # mesh_bounds key -> int8 level per instance
+ball_lod = 0
 
 # ---------------------------
-# Pause, scoring, camera
+# Text cache
 # ---------------------------
-paused = False
-high_score = 0
-camera_mode = "follow"  # "follow", "overhead", "first_person"
-ball_color = [1.0, 0.2, 0.2]  # Default red
-particles = []
+# Every distinct (font, string) is compiled once into a display list of its
+# glutBitmapCharacter calls, least recently used deleted past TEXT_CACHE_SIZE.
+# Each screen (HUD, menu, help, ...) is one more list that places and colours
+# those strings; it is recompiled only when the values it shows change, so an
+# unchanged screen costs a single glCallList.
+TEXT_CACHE_SIZE = 256
+text_lists = OrderedDict()  # (id(font), text) -> display list
+screen_lists = {}           # screen name -> [key, display list, text_lists keys used]
 
 # ---------------------------
-# Lighting / Skybox
+# Frustum culling
 # ---------------------------
-light_position = [0.0, 0.0, 500.0, 1.0]   # <-- FIX: must be length 4
-light_color = [1.0, 1.0, 1.0, 1.0]
-ambient_light = [0.3, 0.3, 0.3, 1.0]
-skybox_size = 2000
+# setup_scene() extracts the six clip planes from the projection and modelview
+# matrices once per frame.  Passes test bounding spheres against them before
+# drawing and tally what they drew and skipped in cull_counts for tuning.
+frustum_planes = np.zeros((6, 4))  # (a, b, c, d), unit inward normals
+frustum_rows = []                  # the same planes as float tuples
+cull_counts = {}                   # pass name -> [drawn, culled] this frame
+
+# Bounding-sphere radii of the cached meshes (obstacle meshes at unit size)
+MESH_RADIUS = {
+    'cube': 17.4, 'torus': 15.0, 'pyramid': 14.2, 'sphere': 10.0, 'teapot': 19.0,
+    'obstacle_sphere': 1.0, 'obstacle_cube': 1.74, 'obstacle_cone': 1.5, 'star': 12.0,
+}
 
 # ---------------------------
-# Game state management
+# Platform boxes
 # ---------------------------
-game_state = "menu"  # "menu", "playing", "paused", "game_over", "win", "help"
-font = GLUT_BITMAP_HELVETICA_18
+# Platforms are drawn from one client-side array of unit-box quads scaled and
+# moved per platform, so hundreds of them are a single glDrawArrays.
+def unit_box():
+    """Vertices and normals (24, 3) of a unit box centred on the origin, as quads."""
+    corners, normals = [], []
+    for axis in range(3):
+        for sign in (-1.0, 1.0):
+            u, v = (axis + 1) % 3, (axis + 2) % 3
+            for du, dv in ((-1, -1), (1, -1), (1, 1), (-1, 1)):
+                p = [0.0, 0.0, 0.0]
+                p[axis], p[u], p[v] = 0.5 * sign, 0.5 * du * sign, 0.5 * dv
+                n = [0.0, 0.0, 0.0]
+                n[axis] = sign
+                corners.append(p)
+                normals.append(n)
+    return np.array(corners, dtype=np.float32), np.array(normals, dtype=np.float32)
+
+BOX_CORNERS, BOX_NORMALS = unit_box()
 
 # ---------------------------
-# Helpers
+# World frame cache
 # ---------------------------
-def generate_holes():
-    global holes
-    holes = set()
-    num_holes = min(30 + level * 3, 150)
-    while len(holes) < num_holes:
-        i = random.randint(0, grid_size_x - 1)
-        j = random.randint(0, grid_size_y - 1)
-        # Don't place holes near the starting position
-        if abs(i - grid_size_x//2) > 3 or abs(j - grid_size_y//2) > 3:
-            holes.add((i, j))
-
-def find_safe_tile():
-    while True:
-        i = random.randint(0, grid_size_x - 1)
-        j = random.randint(0, grid_size_y - 1)
-        if (i, j) not in holes:
-            x = i * tile_size - half_size_x + tile_size / 2
-            y = j * tile_size - half_size_y + tile_size / 2
-            return (x, y)
-
-def find_safe_start_tile():
-    # Find a safe tile near the center
-    center_i = grid_size_x // 2
-    center_j = grid_size_y // 2
-    for radius in range(0, max(grid_size_x, grid_size_y)):
-        for i in range(center_i - radius, center_i + radius + 1):
-            for j in range(center_j - radius, center_j + radius + 1):
-                if 0 <= i < grid_size_x and 0 <= j < grid_size_y and (i, j) not in holes:
-                    x = i * tile_size - half_size_x + tile_size / 2
-                    y = j * tile_size - half_size_y + tile_size / 2
-                    return [x, y, ball_radius]
-    return [0.0, 0.0, ball_radius]
-
-def reset_game(reset_score=True, reset_lives=True):
-    global ball_pos, ball_vel, jumping, jump_start_time, score, lives, game_over, game_won
-    global collectibles, time_last, obstacles, last_tile, time_on_tile, show_timer, special_points
-    global difficulty_timer, difficulty_mode, speed_multiplier, level, paused, high_score
-    global speed_boost_active, speed_boost_timer, slow_trap_active, slow_trap_timer
-    global multiplier_active, multiplier_timer, multiplier_factor, ball_color, particles
-    global shield_active, shield_time, game_state
-
-    if score > high_score:
-        high_score = score
-
-    ball_pos[:] = find_safe_start_tile()
-    ball_vel[:] = [0.0, 0.0, 0.0]
-    jumping = False
-    jump_start_time = 0.0
-
-    if reset_score:
-        score = 0
-        generate_holes()
-        collectibles = []
-        for _ in range(15 + level * 2):
-            x, y = find_safe_tile()
-            collectibles.append({
-                'type': random.choice(['cube', 'torus', 'pyramid', 'sphere', 'teapot']),
-                'pos': (x, y, 15),
-                'color': (random.random(), random.random(), random.random())
-            })
-
-        special_points = []
-        for _ in range(5 + level):
-            x, y = find_safe_tile()
-            special_points.append({'pos': (x, y, 15), 'collected': False})
-
-        # Reset power-ups
-        for boost in speed_boosts:
-            boost['active'] = True
-        for trap in slow_traps:
-            trap['active'] = True
-        for bonus in time_bonuses:
-            bonus['active'] = True
-        for life in life_collectibles:
-            life['active'] = True
-        for mult in multipliers:
-            mult['active'] = True
-        for shield in shields:
-            shield['collected'] = False
-
-        speed_boost_active = False
-        speed_boost_timer = 0.0
-        slow_trap_active = False
-        slow_trap_timer = 0.0
-        multiplier_active = False
-        multiplier_timer = 0.0
-        multiplier_factor = 1
-        ball_color = [1.0, 0.2, 0.2]
-        shield_active = False
-        shield_time = 0
-        particles = []
-
-        # Generate obstacles
-        obstacles = []
-        num_obstacles = min(5 + level * 2, 20)
-        for _ in range(num_obstacles):
-            x = random.uniform(-half_size_x + 50, half_size_x - 50)
-            y = random.uniform(-half_size_y + 50, half_size_y - 50)
-            obstacles.append({
-                'pos': [x, y, 30],
-                'size': random.uniform(15, 30),
-                'type': random.choice(['sphere', 'cube', 'cone']),
-                'color': (random.random() * 0.5 + 0.5, random.random() * 0.3, random.random() * 0.3)
-            })
-
-    if reset_lives:
-        lives = 3
-
-    game_over = False
-    game_won = False
-    time_last = time.time()
-    last_tile = None
-    time_on_tile = 0.0
-    show_timer = False
-
-    difficulty_timer = None
-    difficulty_mode = False
-    speed_multiplier = 1.0 + level * 0.1
-
-    # Reset moving platforms
-    for platform in moving_platforms:
-        platform['pos'] = [platform['pos'][0], platform['pos'][1], platform['pos'][2]]
-
-    game_state = "playing"
+# While nothing in the world can move (paused, menu, help, game over, win) the
+# composed 3D frame is copied into world_texture once; later frames draw it
+# back as one textured quad under the HUD and overlay.  world_frame_key()
+# covers everything the world passes read that can still change then.
+world_texture = None
+world_texture_size = (0, 0)
+world_key = None  # key of the frame in world_texture, None if not cached
 
+# ---------------------------
+# Rendering
+# ---------------------------
 def setup_projection():
     glMatrixMode(GL_PROJECTION)
     glLoadIdentity()
@@ -338,23 +246,69 @@ def setup_scene():
         glClearColor(0.5, 0.8, 1.0, 1.0)
 
     # Camera
+    ball_pos = sim.render_ball_pos()
     if camera_mode == "follow":
         angle_rad = math.radians(camera_angle)
         eye_x = ball_pos[0] - camera_distance * math.cos(angle_rad)
         eye_y = ball_pos[1] + camera_distance * math.sin(angle_rad)
         eye_z = ball_pos[2] + camera_height
         gluLookAt(eye_x, eye_y, eye_z, ball_pos[0], ball_pos[1], ball_pos[2], 0.0, 0.0, 1.0)
+        camera_eye[:] = [eye_x, eye_y, eye_z]
     elif camera_mode == "overhead":
         gluLookAt(0, 0, 800, 0, 0, 0, 0, 1, 0)
+        camera_eye[:] = [0.0, 0.0, 800.0]
     elif camera_mode == "first_person":
+        camera_eye[:] = [ball_pos[0], ball_pos[1], ball_pos[2] + 10]
         gluLookAt(ball_pos[0], ball_pos[1], ball_pos[2] + 10,
                   ball_pos[0] + math.cos(math.radians(camera_angle)) * 10,
                   ball_pos[1] + math.sin(math.radians(camera_angle)) * 10,
                   ball_pos[2] + 10,
                   0.0, 0.0, 1.0)
+    update_frustum()
 
     setup_lighting()
 
+def update_frustum():
+    # GL returns column-major matrices, so the transposes are the real ones
+    proj = np.asarray(glGetFloatv(GL_PROJECTION_MATRIX), dtype=np.float64).reshape(4, 4)
+    view = np.asarray(glGetFloatv(GL_MODELVIEW_MATRIX), dtype=np.float64).reshape(4, 4)
+    clip = proj.T @ view.T
+    planes = np.array([clip[3] + clip[0], clip[3] - clip[0],   # left, right
+                       clip[3] + clip[1], clip[3] - clip[1],   # bottom, top
+                       clip[3] + clip[2], clip[3] - clip[2]])  # near, far
+    planes /= np.linalg.norm(planes[:, :3], axis=1)[:, None]
+    frustum_planes[:] = planes
+    frustum_rows[:] = [tuple(p) for p in planes.tolist()]
+
+def sphere_visible(x, y, z, radius):
+    for a, b, c, d in frustum_rows:
+        if a * x + b * y + c * z + d < -radius:
+            return False
+    return True
+
+def spheres_visible(centres, radii):
+    """Mask of the spheres (centres (n, 3), radii (n,)) at least partly inside."""
+    dist = centres @ frustum_planes[:, :3].T + frustum_planes[:, 3]
+    return (dist >= -radii[:, None]).all(axis=1)
+
+def projected_radius(centres, radii):
+    """Approximate on-screen radius in pixels of spheres seen from camera_eye."""
+    dist = np.maximum(np.linalg.norm(centres - camera_eye, axis=-1), 1.0)
+    return radii * (WINDOW_HEIGHT / (2.0 * math.tan(math.radians(30.0)))) / dist
+
+def lod_for_pixels(px, scale):
+    return sum((px < threshold * scale) * 1 for threshold in LOD_PIXELS)
+
+def pick_lod(current, px):
+    """New LOD levels for objects at `current` with projected radius px."""
+    return np.clip(current, lod_for_pixels(px, 1.0 - LOD_HYSTERESIS),
+                   lod_for_pixels(px, 1.0 + LOD_HYSTERESIS))
+
+def count_culled(name, drawn, culled):
+    counts = cull_counts.setdefault(name, [0, 0])
+    counts[0] += drawn
+    counts[1] += culled
+
 def draw_skybox():
     glDisable(GL_LIGHTING)
     glBegin(GL_QUADS)
@@ -408,194 +362,421 @@ def draw_skybox():
     glEnd()
     glEnable(GL_LIGHTING)
 
-def draw_floor():
+def floor_vertices(ii, jj, hole):
+    """Vertex data for tiles (ii[k], jj[k]); returns (n, 8, 6) float32."""
     colors = theme_colors[theme]
-    for i in range(grid_size_x):
-        for j in range(grid_size_y):
-            x = i * tile_size - half_size_x
-            y = j * tile_size - half_size_y
-            if (i, j) in holes:
-                glColor3f(*colors["hole"])
-                glBegin(GL_QUADS)
-                glVertex3f(x, y, 0.0)
-                glVertex3f(x + tile_size, y, 0.0)
-                glVertex3f(x + tile_size, y + tile_size, 0.0)
-                glVertex3f(x, y + tile_size, 0.0)
-                glEnd()
-
-                # Draw hole depth
-                glColor3f(colors["hole"][0] * 0.7, colors["hole"][1] * 0.7, colors["hole"][2] * 0.7)
-                glBegin(GL_QUADS)
-                glVertex3f(x + 5, y + 5, -20.0)
-                glVertex3f(x + tile_size - 5, y + 5, -20.0)
-                glVertex3f(x + tile_size - 5, y + tile_size - 5, -20.0)
-                glVertex3f(x + 5, y + tile_size - 5, -20.0)
-                glEnd()
+    ts = sim.tile_size
+    x = ii * ts - sim.half_size_x
+    y = jj * ts - sim.half_size_y
+    v = np.zeros((len(ii), FLOOR_VERTS_PER_TILE, 6), dtype=np.float32)
+
+    # Top quad: checkerboard or hole colour
+    for k, (cx, cy) in enumerate([(0, 0), (1, 0), (1, 1), (0, 1)]):
+        v[:, k, 0] = x + cx * ts
+        v[:, k, 1] = y + cy * ts
+    checker = np.where(((ii + jj) % 2 == 0)[:, None], colors["floor2"], colors["floor1"])
+    v[:, :4, 3:] = np.where(hole[:, None], colors["hole"], checker)[:, None, :]
+
+    # Hole depth quad, inset and sunk below the floor
+    for k, (cx, cy) in enumerate([(5, 5), (ts - 5, 5), (ts - 5, ts - 5), (5, ts - 5)]):
+        v[:, 4 + k, 0] = np.where(hole, x + cx, x)
+        v[:, 4 + k, 1] = np.where(hole, y + cy, y)
+        v[:, 4 + k, 2] = np.where(hole, -20.0, 0.0)
+    v[:, 4:, 3:] = (np.array(colors["hole"]) * 0.7)[None, None, :]
+    return v
+
+def chunk_bounds(ci, cj):
+    i0, j0 = ci * FLOOR_CHUNK, cj * FLOOR_CHUNK
+    return i0, j0, min(i0 + FLOOR_CHUNK, sim.grid_size_x), min(j0 + FLOOR_CHUNK, sim.grid_size_y)
+
+def build_floor_chunk(ci, cj):
+    i0, j0, i1, j1 = chunk_bounds(ci, cj)
+    ii, jj = np.meshgrid(np.arange(i0, i1), np.arange(j0, j1), indexing='ij')
+    data = floor_vertices(ii.ravel(), jj.ravel(), sim.state.hole_map[i0:i1, j0:j1].ravel())
+    vbo = glGenBuffers(1)
+    glBindBuffer(GL_ARRAY_BUFFER, vbo)
+    glBufferData(GL_ARRAY_BUFFER, data.nbytes, data, GL_DYNAMIC_DRAW)
+    return [vbo, data.shape[0] * FLOOR_VERTS_PER_TILE]
+
+def free_floor_chunks():
+    for vbo, _ in floor_chunks.values():
+        glDeleteBuffers(1, [vbo])
+    floor_chunks.clear()
+
+def update_floor_cache():
+    global floor_key
+    key = (sim.state.holes_version, theme, sim.grid_size_x, sim.grid_size_y, sim.tile_size)
+    if key != floor_key:
+        free_floor_chunks()
+        floor_key = key
+        sim.hole_changes.clear()
+    elif sim.hole_changes:
+        for i, j in sim.hole_changes:
+            chunk = floor_chunks.get((i // FLOOR_CHUNK, j // FLOOR_CHUNK))
+            if chunk is None:
+                continue  # built with the current holes when it is next needed
+            i0, j0, i1, j1 = chunk_bounds(i // FLOOR_CHUNK, j // FLOOR_CHUNK)
+            data = floor_vertices(np.array([i]), np.array([j]), np.array([sim.state.hole_map[i, j]]))
+            offset = ((i - i0) * (j1 - j0) + (j - j0)) * FLOOR_VERTS_PER_TILE * FLOOR_STRIDE
+            glBindBuffer(GL_ARRAY_BUFFER, chunk[0])
+            glBufferSubData(GL_ARRAY_BUFFER, offset, data.nbytes, data)
+        sim.hole_changes.clear()
+
+def visible_floor_chunks():
+    """Chunks within floor_view_distance of the camera and inside the frustum."""
+    span = FLOOR_CHUNK * sim.tile_size
+    ex, ey, ez = camera_eye
+    reach = floor_view_distance
+    ci_lo = max(0, int((ex - reach + sim.half_size_x) // span))
+    ci_hi = min((sim.grid_size_x - 1) // FLOOR_CHUNK, int((ex + reach + sim.half_size_x) // span))
+    cj_lo = max(0, int((ey - reach + sim.half_size_y) // span))
+    cj_hi = min((sim.grid_size_y - 1) // FLOOR_CHUNK, int((ey + reach + sim.half_size_y) // span))
+    # Sphere around the chunk's tiles, including the sunken hole quads
+    radius = math.hypot(span * 0.5 * math.sqrt(2.0), 10.0)
+    chunks = []
+    culled = 0
+    for ci in range(ci_lo, ci_hi + 1):
+        x0 = ci * span - sim.half_size_x
+        dx = max(x0 - ex, 0.0, ex - (x0 + span))
+        for cj in range(cj_lo, cj_hi + 1):
+            y0 = cj * span - sim.half_size_y
+            dy = max(y0 - ey, 0.0, ey - (y0 + span))
+            if dx * dx + dy * dy + ez * ez > reach * reach:
+                continue
+            if sphere_visible(x0 + span * 0.5, y0 + span * 0.5, -10.0, radius):
+                chunks.append((ci, cj))
             else:
-                if (i + j) % 2 == 0:
-                    glColor3f(*colors["floor2"])
-                else:
-                    glColor3f(*colors["floor1"])
-                glBegin(GL_QUADS)
-                glVertex3f(x, y, 0.0)
-                glVertex3f(x + tile_size, y, 0.0)
-                glVertex3f(x + tile_size, y + tile_size, 0.0)
-                glVertex3f(x, y + tile_size, 0.0)
-                glEnd()
+                culled += 1
+    count_culled('draw_floor', len(chunks), culled)
+    return chunks
+
+def draw_floor():
+    update_floor_cache()
+    glNormal3f(0.0, 0.0, 1.0)
+    glEnableClientState(GL_VERTEX_ARRAY)
+    glEnableClientState(GL_COLOR_ARRAY)
+    for key in visible_floor_chunks():
+        chunk = floor_chunks.get(key)
+        if chunk is None:
+            chunk = floor_chunks[key] = build_floor_chunk(*key)
+        else:
+            floor_chunks.move_to_end(key)
+        glBindBuffer(GL_ARRAY_BUFFER, chunk[0])
+        glVertexPointer(3, GL_FLOAT, FLOOR_STRIDE, ctypes.c_void_p(0))
+        glColorPointer(3, GL_FLOAT, FLOOR_STRIDE, ctypes.c_void_p(12))
+        glDrawArrays(GL_QUADS, 0, chunk[1])
+    glDisableClientState(GL_COLOR_ARRAY)
+    glDisableClientState(GL_VERTEX_ARRAY)
+    glBindBuffer(GL_ARRAY_BUFFER, 0)
+
+    while len(floor_chunks) > FLOOR_MAX_CHUNKS:
+        _, (vbo, _) = floor_chunks.popitem(last=False)
+        glDeleteBuffers(1, [vbo])
 
 def draw_walls():
     colors = theme_colors[theme]
     glColor3f(*colors["wall"])
-    for sx, sy in [(-half_size_x,0),(half_size_x,0),(0,half_size_y),(0,-half_size_y)]:
+    for sx, sy in [(-sim.half_size_x,0),(sim.half_size_x,0),(0,sim.half_size_y),(0,-sim.half_size_y)]:
         glBegin(GL_QUADS)
         if sx != 0:
             x = sx
-            glVertex3f(x, -half_size_y, 0)
-            glVertex3f(x,  half_size_y, 0)
-            glVertex3f(x,  half_size_y, wall_height)
-            glVertex3f(x, -half_size_y, wall_height)
+            glVertex3f(x, -sim.half_size_y, 0)
+            glVertex3f(x,  sim.half_size_y, 0)
+            glVertex3f(x,  sim.half_size_y, wall_height)
+            glVertex3f(x, -sim.half_size_y, wall_height)
         else:
             y = sy
-            glVertex3f(-half_size_x, y, 0)
-            glVertex3f( half_size_x, y, 0)
-            glVertex3f( half_size_x, y, wall_height)
-            glVertex3f(-half_size_x, y, wall_height)
+            glVertex3f(-sim.half_size_x, y, 0)
+            glVertex3f( sim.half_size_x, y, 0)
+            glVertex3f( sim.half_size_x, y, wall_height)
+            glVertex3f(-sim.half_size_x, y, wall_height)
         glEnd()
 
+def draw_pyramid():
+    # Lit with an explicit up normal rather than whatever the previous draw left
+    glNormal3f(0.0, 0.0, 1.0)
+    glBegin(GL_TRIANGLES)
+    glVertex3f(0, 0, 10); glVertex3f(-10, -10, 0); glVertex3f(10, -10, 0)
+    glVertex3f(0, 0, 10); glVertex3f(10, -10, 0); glVertex3f(10, 10, 0)
+    glVertex3f(0, 0, 10); glVertex3f(10, 10, 0); glVertex3f(-10, 10, 0)
+    glVertex3f(0, 0, 10); glVertex3f(-10, 10, 0); glVertex3f(-10, -10, 0)
+    glEnd()
+    glBegin(GL_QUADS)
+    glVertex3f(-10, -10, 0); glVertex3f(10, -10, 0); glVertex3f(10, 10, 0); glVertex3f(-10, 10, 0)
+    glEnd()
+
+def draw_star():
+    glNormal3f(0.0, 0.0, 1.0)
+    glBegin(GL_TRIANGLE_FAN)
+    glVertex3f(0, 0, 0)
+    for i in range(11):
+        angle = i * 2 * math.pi / 10
+        radius = 12 if i % 2 == 0 else 6
+        glVertex3f(math.cos(angle) * radius, math.sin(angle) * radius, 0)
+    glEnd()
+
+def compile_mesh(draw):
+    mesh = glGenLists(1)
+    glNewList(mesh, GL_COMPILE)
+    before = profiler.vertices
+    draw()
+    glEndList()
+    profiler.count_list(mesh, before)
+    return mesh
+
+def build_mesh_cache():
+    # Count what each list submits so the profiler can charge glCallList
+    profiler.instrument(globals())
+    # Collectibles (fixed size)
+    mesh_lists['cube'] = compile_mesh(lambda: glutSolidCube(20))
+    mesh_lists['torus'] = compile_mesh(lambda: glutSolidTorus(5, 10, 16, 16))
+    mesh_lists['pyramid'] = compile_mesh(draw_pyramid)
+    mesh_lists['sphere'] = compile_mesh(lambda: glutSolidSphere(10, 16, 16))
+    mesh_lists['teapot'] = compile_mesh(lambda: glutSolidTeapot(10))
+    # Obstacles and the ball (unit size, scaled per instance)
+    mesh_lods['obstacle_sphere'] = [compile_mesh(lambda n=n: glutSolidSphere(1, n, n)) for n in LOD_SLICES]
+    mesh_lods['obstacle_cone'] = [compile_mesh(lambda n=n: glutSolidCone(1, 1.5, n, n)) for n in LOD_SLICES]
+    mesh_lists['obstacle_sphere'] = mesh_lods['obstacle_sphere'][0]
+    mesh_lists['obstacle_cube'] = compile_mesh(lambda: glutSolidCube(2))
+    mesh_lists['obstacle_cone'] = mesh_lods['obstacle_cone'][0]
+    mesh_lists['star'] = compile_mesh(draw_star)
+    if not profiler.enabled:
+        profiler.uninstrument(globals())
+
+def group_rows(shapes, rows, names):
+    """Split rows by shapes[rows], keyed by the shape's name in names."""
+    kinds = shapes[rows]
+    return {names[k]: rows[kinds == k] for k in np.unique(kinds).tolist()}
+
+def refresh_mesh_groups():
+    global mesh_groups_key
+    s = sim.state
+    if mesh_groups_key != s.level_version:
+        rows = np.flatnonzero(s.pickup_kind == sim.PICKUP_COLLECTIBLE)
+        mesh_groups['collectibles'] = group_rows(s.pickup_shape, rows, sim.COLLECTIBLE_SHAPES)
+        rows = np.arange(len(s.obstacle_shape))
+        mesh_groups['obstacles'] = group_rows(s.obstacle_shape, rows, sim.OBSTACLE_SHAPES)
+        mesh_groups['special_points'] = np.flatnonzero(s.pickup_kind == sim.PICKUP_SPECIAL)
+        mesh_bounds.clear()
+        mesh_lod_levels.clear()
+        for kind, rows in mesh_groups['collectibles'].items():
+            mesh_bounds['collectibles', kind] = s.pickup_pos[rows], np.full(len(rows), MESH_RADIUS[kind])
+        for kind, rows in mesh_groups['obstacles'].items():
+            mesh_bounds['obstacles', kind] = s.obstacle_pos[rows], s.obstacle_size[rows] * MESH_RADIUS['obstacle_' + kind]
+        rows = mesh_groups['special_points']
+        mesh_bounds['special_points'] = s.pickup_pos[rows], np.full(len(rows), MESH_RADIUS['star'])
+        mesh_groups_key = s.level_version
+
 def draw_collectibles():
-    for c in collectibles:
+    refresh_mesh_groups()
+    s = sim.state
+    drawn = culled = 0
+    for kind, rows in mesh_groups['collectibles'].items():
+        mesh = mesh_lists[kind]
+        visible = spheres_visible(*mesh_bounds['collectibles', kind])
+        for row, seen in zip(rows.tolist(), visible):
+            if not s.pickup_active[row]:
+                continue
+            if not seen:
+                culled += 1
+                continue
+            drawn += 1
+            glPushMatrix()
+            x, y, z = s.pickup_pos[row].tolist()
+            glTranslatef(x, y, z)
+            glColor3f(*s.pickup_color[row].tolist())
+            glCallList(mesh)
+            glPopMatrix()
+    count_culled('draw_collectibles', drawn, culled)
+
+def draw_special_points():
+    refresh_mesh_groups()
+    s = sim.state
+    mesh = mesh_lists['star']
+    glColor3f(1.0, 1.0, 0.0)
+    drawn = culled = 0
+    rows = mesh_groups['special_points']
+    for row, seen in zip(rows.tolist(), spheres_visible(*mesh_bounds['special_points'])):
+        if not s.pickup_active[row]:
+            continue
+        if not seen:
+            culled += 1
+            continue
+        drawn += 1
         glPushMatrix()
-        x, y, z = c['pos']
+        x, y, z = s.pickup_pos[row].tolist()
         glTranslatef(x, y, z)
-        glColor3f(*c['color'])
-        if c['type'] == 'cube':
-            glutSolidCube(20)
-        elif c['type'] == 'torus':
-            glutSolidTorus(5, 10, 16, 16)
-        elif c['type'] == 'pyramid':
-            glBegin(GL_TRIANGLES)
-            glVertex3f(0, 0, 10); glVertex3f(-10, -10, 0); glVertex3f(10, -10, 0)
-            glVertex3f(0, 0, 10); glVertex3f(10, -10, 0); glVertex3f(10, 10, 0)
-            glVertex3f(0, 0, 10); glVertex3f(10, 10, 0); glVertex3f(-10, 10, 0)
-            glVertex3f(0, 0, 10); glVertex3f(-10, 10, 0); glVertex3f(-10, -10, 0)
-            glEnd()
-            glBegin(GL_QUADS)
-            glVertex3f(-10, -10, 0); glVertex3f(10, -10, 0); glVertex3f(10, 10, 0); glVertex3f(-10, 10, 0)
-            glEnd()
-        elif c['type'] == 'sphere':
-            glutSolidSphere(10, 16, 16)
-        elif c['type'] == 'teapot':
-            glutSolidTeapot(10)
+        glCallList(mesh)
         glPopMatrix()
+    count_culled('draw_special_points', drawn, culled)
 
-def draw_special_points():
-    for sp in special_points:
-        if not sp['collected']:
+def draw_obstacles():
+    refresh_mesh_groups()
+    s = sim.state
+    glEnable(GL_RESCALE_NORMAL)
+    drawn = culled = 0
+    for kind, rows in mesh_groups['obstacles'].items():
+        key = ('obstacles', kind)
+        visible = spheres_visible(*mesh_bounds[key])
+        culled += len(rows) - int(visible.sum())
+        lods = mesh_lods.get('obstacle_' + kind)
+        if lods is None:
+            meshes = [mesh_lists['obstacle_' + kind]] * len(rows)
+        else:
+            levels = mesh_lod_levels.setdefault(key, np.zeros(len(rows), dtype=np.int8))
+            levels[:] = pick_lod(levels, projected_radius(*mesh_bounds[key]))
+            meshes = [lods[k] for k in levels.tolist()]
+        for row, seen, mesh in zip(rows.tolist(), visible, meshes):
+            if not seen:
+                continue
+            drawn += 1
             glPushMatrix()
-            x, y, z = sp['pos']
+            x, y, z = s.obstacle_pos[row].tolist()
+            size = s.obstacle_size[row].item()
             glTranslatef(x, y, z)
-            glColor3f(1.0, 1.0, 0.0)
-            glBegin(GL_TRIANGLE_FAN)
-            glVertex3f(0, 0, 0)
-            for i in range(11):
-                angle = i * 2 * math.pi / 10
-                radius = 12 if i % 2 == 0 else 6
-                glVertex3f(math.cos(angle) * radius, math.sin(angle) * radius, 0)
-            glEnd()
+            glScalef(size, size, size)
+            glColor3f(*s.obstacle_color[row].tolist())
+            glCallList(mesh)
             glPopMatrix()
-
-def draw_obstacles():
-    for o in obstacles:
+    glDisable(GL_RESCALE_NORMAL)
+    count_culled('draw_obstacles', drawn, culled)
+
+def draw_enemies():
+    pos = sim.render_enemy_pos()
+    radii = np.full(len(pos), sim.enemy_radius)
+    visible = spheres_visible(pos, radii)
+    levels = mesh_lod_levels.get('enemies')
+    if levels is None or len(levels) != len(pos):
+        levels = mesh_lod_levels['enemies'] = np.zeros(len(pos), dtype=np.int8)
+    levels[:] = pick_lod(levels, projected_radius(pos, radii))
+    lods = mesh_lods['obstacle_sphere']
+    glEnable(GL_RESCALE_NORMAL)
+    glColor3f(0.45, 0.0, 0.6)
+    for (x, y, z), seen, level in zip(pos.tolist(), visible, levels.tolist()):
+        if not seen:
+            continue
         glPushMatrix()
-        x, y, z = o['pos']
         glTranslatef(x, y, z)
-        glColor3f(*o['color'])
-        if o['type'] == 'sphere':
-            glutSolidSphere(o['size'], 32, 32)
-        elif o['type'] == 'cube':
-            glutSolidCube(o['size'] * 2)
-        elif o['type'] == 'cone':
-            glutSolidCone(o['size'], o['size'] * 1.5, 32, 32)
+        glScalef(sim.enemy_radius, sim.enemy_radius, sim.enemy_radius)
+        glCallList(lods[level])
         glPopMatrix()
+    glDisable(GL_RESCALE_NORMAL)
+    drawn = int(visible.sum())
+    count_culled('draw_enemies', drawn, len(pos) - drawn)
 
 def draw_ball():
+    global ball_lod
+    x, y, z = sim.render_ball_pos()
+    if not sphere_visible(x, y, z, sim.ball_radius * 1.5):
+        count_culled('draw_ball', 0, 1)
+        return
+    count_culled('draw_ball', 1, 0)
+    ball_lod = int(pick_lod(ball_lod, projected_radius(np.array((x, y, z)), sim.ball_radius)))
+    mesh = mesh_lods['obstacle_sphere'][ball_lod]
     glPushMatrix()
-    glTranslatef(ball_pos[0], ball_pos[1], ball_pos[2])
-    glColor3f(*ball_color)
-    glutSolidSphere(ball_radius, 32, 32)
+    glTranslatef(x, y, z)
+    glEnable(GL_RESCALE_NORMAL)
+    glColor3f(*sim.state.ball_color)
+    glScalef(sim.ball_radius, sim.ball_radius, sim.ball_radius)
+    glCallList(mesh)
     # Shield effect
-    if shield_active:
+    if sim.state.shield_active:
         glDisable(GL_LIGHTING)
         glEnable(GL_BLEND)
         glColor4f(0.0, 0.8, 1.0, 0.2)
-        glutSolidSphere(ball_radius * 1.5, 32, 32)
+        glScalef(1.5, 1.5, 1.5)
+        glCallList(mesh)
         glDisable(GL_BLEND)
         glEnable(GL_LIGHTING)
+    glDisable(GL_RESCALE_NORMAL)
     glPopMatrix()
 
 def draw_particles():
-    if not particles:
+    sync_particles()
+    alive = np.flatnonzero(particle_life > 0)
+    if not len(alive):
         return
+    # Fixed-function points share one size per draw call, so bucket particles
+    # by whole-unit radius and draw each bucket as one run of GL_POINTS.
+    buckets = np.rint(particle_size[alive]).astype(np.int32)
+    order = np.argsort(buckets, kind='stable')
+    alive = alive[order]
+    buckets = buckets[order]
+    pos = np.ascontiguousarray(particle_pos[alive])
+    color = particle_color[alive]
+    color[:, 3] = np.clip(particle_life[alive] / 30.0, 0.0, 1.0)
+
     glDisable(GL_LIGHTING)
     glEnable(GL_BLEND)
-    for p in particles:
-        glPushMatrix()
-        glTranslatef(p['pos'][0], p['pos'][1], p['pos'][2])
-        glColor4f(p['color'][0], p['color'][1], p['color'][2], max(0.0, min(1.0, p['life'] / 30.0)))
-        glutSolidSphere(p['size'], 8, 8)
-        glPopMatrix()
+    glEnable(GL_POINT_SMOOTH)
+    # Points shrink with eye distance like the spheres they replace
+    glPointParameterfv(GL_POINT_DISTANCE_ATTENUATION, [0.0, 0.0, 1.0])
+    pixels_per_unit = WINDOW_HEIGHT / math.tan(math.radians(30.0))
+    glEnableClientState(GL_VERTEX_ARRAY)
+    glEnableClientState(GL_COLOR_ARRAY)
+    glVertexPointer(3, GL_FLOAT, 0, pos)
+    glColorPointer(4, GL_FLOAT, 0, color)
+    first = 0
+    for size, count in zip(*np.unique(buckets, return_counts=True)):
+        glPointSize(max(1.0, size * pixels_per_unit))
+        glDrawArrays(GL_POINTS, first, int(count))
+        first += int(count)
+    glDisableClientState(GL_COLOR_ARRAY)
+    glDisableClientState(GL_VERTEX_ARRAY)
+    glPointParameterfv(GL_POINT_DISTANCE_ATTENUATION, [1.0, 0.0, 0.0])
+    glDisable(GL_POINT_SMOOTH)
     glDisable(GL_BLEND)
     glEnable(GL_LIGHTING)
 
 def draw_moving_platforms():
-    for platform in moving_platforms:
-        glPushMatrix()
-        x, y, z = platform['pos']
-        glTranslatef(x, y, z)
-        glColor3f(0.5, 0.5, 0.5)
-        glScalef(platform['size'][0], platform['size'][1], platform['size'][2])
-        glutSolidCube(1)
-        glPopMatrix()
+    pos = sim.render_platform_pos()
+    if not len(pos):
+        return
+    size = sim.state.platform_layout['size']
+    visible = spheres_visible(pos, 0.5 * np.linalg.norm(size, axis=1))
+    drawn = int(visible.sum())
+    count_culled('draw_moving_platforms', drawn, len(pos) - drawn)
+    if not drawn:
+        return
+    vertices = (pos[visible, None, :] + BOX_CORNERS * size[visible, None, :]).astype(np.float32)
+    normals = np.tile(BOX_NORMALS, (drawn, 1))
+    glColor3f(0.5, 0.5, 0.5)
+    glEnableClientState(GL_VERTEX_ARRAY)
+    glEnableClientState(GL_NORMAL_ARRAY)
+    glVertexPointer(3, GL_FLOAT, 0, vertices)
+    glNormalPointer(GL_FLOAT, 0, normals)
+    glDrawArrays(GL_QUADS, 0, 24 * drawn)
+    glDisableClientState(GL_NORMAL_ARRAY)
+    glDisableClientState(GL_VERTEX_ARRAY)
 
 def draw_power_ups():
-    def draw_box(pos, color, size=15):
+    s = sim.state
+    drawn = culled = 0
+    for row in np.flatnonzero(s.pickup_active & (s.pickup_kind < sim.PICKUP_COLLECTIBLE)).tolist():
+        color, size = POWER_UP_LOOK[s.pickup_kind[row]]
+        x, y, z = s.pickup_pos[row].tolist()
+        if not sphere_visible(x, y, z, size * 0.87):
+            culled += 1
+            continue
+        drawn += 1
         glPushMatrix()
-        x, y, z = pos
         glTranslatef(x, y, z)
         glColor3f(*color)
         glutSolidCube(size)
         glPopMatrix()
-
-    for boost in speed_boosts:
-        if boost['active']:
-            draw_box(boost['pos'], (0.0, 0.0, 1.0), 15)
-
-    for trap in slow_traps:
-        if trap['active']:
-            draw_box(trap['pos'], (1.0, 0.0, 1.0), 15)
-
-    for bonus in time_bonuses:
-        if bonus['active']:
-            draw_box(bonus['pos'], (0.5, 0.5, 0.0), 15)
-
-    for life in life_collectibles:
-        if life['active']:
-            draw_box(life['pos'], (1.0, 0.0, 0.0), 20)
-
-    for mult in multipliers:
-        if mult['active']:
-            draw_box(mult['pos'], (1.0, 1.0, 0.0), 18)
-
-    for shield in shields:
-        if not shield['collected']:
-            draw_box(shield['pos'], (0.0, 1.0, 1.0), 25)
+    count_culled('draw_power_ups', drawn, culled)
 
 def draw_teleporters():
     glDisable(GL_LIGHTING)
     glEnable(GL_BLEND)
-    for tele in teleporters:
+    drawn = culled = 0
+    for (x, y, z), _ in sim.teleporters:
+        # Torus of radius 20 and a 20-high cone above its centre
+        if not sphere_visible(x, y, z + 5, 26.0):
+            culled += 1
+            continue
+        drawn += 1
         glPushMatrix()
-        x, y, z = tele['pos']
         glTranslatef(x, y, z)
         glColor4f(0.0, 1.0, 0.0, 0.7)
         glutSolidTorus(5, 15, 16, 16)
@@ -605,11 +786,104 @@ def draw_teleporters():
         glPopMatrix()
     glDisable(GL_BLEND)
     glEnable(GL_LIGHTING)
+    count_culled('draw_teleporters', drawn, culled)
 
-def draw_text(x, y, text):
+def draw_text(x, y, text, face=None):
+    """Immediate bitmap text, for strings that change every frame."""
     glRasterPos2f(x, y)
+    face = face or font
+    for ch in text:
+        glutBitmapCharacter(face, ord(ch))
+
+def text_list(text, face):
+    key = (id(face), text)  # GLUT font handles are ctypes pointers, not hashable
+    mesh = text_lists.get(key)
+    if mesh is not None:
+        text_lists.move_to_end(key)
+        return mesh
+    mesh = glGenLists(1)
+    glNewList(mesh, GL_COMPILE)
     for ch in text:
-        glutBitmapCharacter(font, ord(ch))
+        glutBitmapCharacter(face, ord(ch))
+    glEndList()
+    text_lists[key] = mesh
+    return mesh
+
+def trim_text_cache(keep):
+    """Delete least recently used strings, sparing the `keep` newest."""
+    while len(text_lists) > max(TEXT_CACHE_SIZE, keep):
+        old_key, old = text_lists.popitem(last=False)
+        glDeleteLists(old, 1)
+        for entry in screen_lists.values():
+            if old_key in entry[2]:
+                entry[0] = None  # calls the deleted list; recompile on next draw
+
+def draw_lines(name, key, layout, face=None):
+    """Draw the (color, x, y, text) lines returned by layout() as screen `name`.
+
+    layout() only runs when key (or the font or window size) differs from the
+    previous call; otherwise the compiled screen is replayed.
+    """
+    face = face or font
+    key = (key, face, WINDOW_WIDTH, WINDOW_HEIGHT)
+    entry = screen_lists.get(name)
+    if entry is None or entry[0] != key:
+        lines = layout()
+        # Strings are compiled first: lists cannot be compiled inside a list
+        meshes = [text_list(text, face) for _, _, _, text in lines]
+        if entry is None:
+            entry = screen_lists[name] = [None, glGenLists(1), set()]
+        glNewList(entry[1], GL_COMPILE)
+        for (color, x, y, _), mesh in zip(lines, meshes):
+            glColor3f(*color)
+            glRasterPos2f(x, y)
+            glCallList(mesh)
+        glEndList()
+        entry[0] = key
+        entry[2] = {(id(face), text) for _, _, _, text in lines}
+        trim_text_cache(len(lines))
+    glCallList(entry[1])
+
+def hud_key():
+    s = sim.state
+    return (s.score, s.lives, s.level, s.high_score,
+            s.speed_boost_active and round(s.speed_boost_timer, 1),
+            s.slow_trap_active and round(s.slow_trap_timer, 1),
+            s.multiplier_active and (s.multiplier_factor, round(s.multiplier_timer, 1)),
+            s.shield_active and round(s.shield_time, 1),
+            s.show_timer and round(max(0, sim.max_tile_time - s.time_on_tile), 1),
+            camera_mode, theme, s.paused, rewinding)
+
+def hud_lines():
+    s = sim.state
+    lines = [
+        ((1, 1, 1), 10, WINDOW_HEIGHT - 30, f"Score: {s.score}"),
+        ((1, 1, 1), 10, WINDOW_HEIGHT - 60, f"Lives: {s.lives}"),
+        ((1, 1, 1), 10, WINDOW_HEIGHT - 90, f"Level: {s.level}"),
+        ((1, 1, 1), 10, WINDOW_HEIGHT - 120, f"High Score: {s.high_score}"),
+    ]
+    status = []
+    if s.speed_boost_active:
+        status.append(((0, 1, 1), f"Speed Boost: {s.speed_boost_timer:.1f}s"))
+    if s.slow_trap_active:
+        status.append(((1, 0, 1), f"Slow Trap: {s.slow_trap_timer:.1f}s"))
+    if s.multiplier_active:
+        status.append(((1, 1, 0), f"Multiplier x{s.multiplier_factor}: {s.multiplier_timer:.1f}s"))
+    if s.shield_active:
+        status.append(((0, 1, 1), f"Shield: {s.shield_time:.1f}s"))
+    if s.show_timer:
+        time_left = max(0, sim.max_tile_time - s.time_on_tile)
+        status.append(((1, 0.5, 0), f"Move in: {time_left:.1f}s"))
+    for k, (color, text) in enumerate(status):
+        lines.append((color, 10, WINDOW_HEIGHT - 150 - 30 * k, text))
+
+    lines.append(((1, 1, 1), WINDOW_WIDTH - 200, WINDOW_HEIGHT - 30, f"Camera: {camera_mode}"))
+    lines.append(((1, 1, 1), WINDOW_WIDTH - 200, WINDOW_HEIGHT - 60, f"Theme: {theme}"))
+    if s.paused:
+        lines.append(((1, 0, 0), WINDOW_WIDTH // 2 - 50, WINDOW_HEIGHT // 2, "PAUSED"))
+    if rewinding:
+        lines.append(((1, 1, 0), WINDOW_WIDTH // 2 - 50, WINDOW_HEIGHT - 30, "<< REWIND"))
+    return lines
 
 def draw_hud():
     glMatrixMode(GL_PROJECTION)
@@ -623,32 +897,8 @@ def draw_hud():
     glDisable(GL_LIGHTING)
     glEnable(GL_BLEND)
 
-    # Draw score / lives
-    glColor3f(1, 1, 1)
-    draw_text(10, WINDOW_HEIGHT - 30, f"Score: {score}")
-    draw_text(10, WINDOW_HEIGHT - 60, f"Lives: {lives}")
-    draw_text(10, WINDOW_HEIGHT - 90, f"Level: {level}")
-    draw_text(10, WINDOW_HEIGHT - 120, f"High Score: {high_score}")
-
-    y_offset = 150
-    if speed_boost_active:
-        glColor3f(0, 1, 1); draw_text(10, WINDOW_HEIGHT - y_offset, f"Speed Boost: {speed_boost_timer:.1f}s"); y_offset += 30
-    if slow_trap_active:
-        glColor3f(1, 0, 1); draw_text(10, WINDOW_HEIGHT - y_offset, f"Slow Trap: {slow_trap_timer:.1f}s"); y_offset += 30
-    if multiplier_active:
-        glColor3f(1, 1, 0); draw_text(10, WINDOW_HEIGHT - y_offset, f"Multiplier x{multiplier_factor}: {multiplier_timer:.1f}s"); y_offset += 30
-    if shield_active:
-        glColor3f(0, 1, 1); draw_text(10, WINDOW_HEIGHT - y_offset, f"Shield: {shield_time:.1f}s"); y_offset += 30
-
-    if show_timer:
-        time_left = max(0, max_tile_time - time_on_tile)
-        glColor3f(1, 0.5, 0); draw_text(10, WINDOW_HEIGHT - y_offset, f"Move in: {time_left:.1f}s"); y_offset += 30
-
-    glColor3f(1, 1, 1)
-    draw_text(WINDOW_WIDTH - 200, WINDOW_HEIGHT - 30, f"Camera: {camera_mode}")
-    draw_text(WINDOW_WIDTH - 200, WINDOW_HEIGHT - 60, f"Theme: {theme}")
-    if paused:
-        glColor3f(1, 0, 0); draw_text(WINDOW_WIDTH // 2 - 50, WINDOW_HEIGHT // 2, "PAUSED")
+    # Score, lives, power-up timers, camera and theme
+    draw_lines("hud", hud_key(), hud_lines)
 
     glDisable(GL_BLEND)
     glEnable(GL_LIGHTING)
@@ -677,12 +927,13 @@ def draw_menu():
     glVertex2f(WINDOW_WIDTH // 2 - 200, WINDOW_HEIGHT // 2 - 150)
     glEnd()
 
-    glColor3f(1, 1, 1)
-    draw_text(WINDOW_WIDTH // 2 - 80, WINDOW_HEIGHT // 2 + 100, "3D BALL GAME")
-    draw_text(WINDOW_WIDTH // 2 - 100, WINDOW_HEIGHT // 2 + 50, "Press SPACE to Start")
-    draw_text(WINDOW_WIDTH // 2 - 80, WINDOW_HEIGHT // 2, "Press H for Help")
-    draw_text(WINDOW_WIDTH // 2 - 70, WINDOW_HEIGHT // 2 - 50, "Press Q to Quit")
-    draw_text(WINDOW_WIDTH // 2 - 100, WINDOW_HEIGHT // 2 - 100, f"High Score: {high_score}")
+    draw_lines("menu", sim.state.high_score, lambda: [
+        ((1, 1, 1), WINDOW_WIDTH // 2 - 80, WINDOW_HEIGHT // 2 + 100, "3D BALL GAME"),
+        ((1, 1, 1), WINDOW_WIDTH // 2 - 100, WINDOW_HEIGHT // 2 + 50, "Press SPACE to Start"),
+        ((1, 1, 1), WINDOW_WIDTH // 2 - 80, WINDOW_HEIGHT // 2, "Press H for Help"),
+        ((1, 1, 1), WINDOW_WIDTH // 2 - 70, WINDOW_HEIGHT // 2 - 50, "Press Q to Quit"),
+        ((1, 1, 1), WINDOW_WIDTH // 2 - 100, WINDOW_HEIGHT // 2 - 100, f"High Score: {sim.state.high_score}"),
+    ])
 
     glDisable(GL_BLEND)
     glEnable(GL_LIGHTING)
@@ -691,6 +942,28 @@ def draw_menu():
     glPopMatrix()
     glMatrixMode(GL_MODELVIEW)
 
+HELP_TEXT = [
+    (80, "CONTROLS:"),
+    (110, "W/A/S/D - Move ball"),
+    (140, "SPACE - Jump"),
+    (170, "Arrow Keys - Rotate camera"),
+    (200, "C - Change camera mode"),
+    (230, "T - Change theme"),
+    (260, "P - Pause game"),
+    (290, "R - Restart game, hold B - Rewind"),
+    (320, "M - Toggle menu"),
+    (350, "F - Frame profiler (E - export CSV)"),
+    (380, "Q or ESC - Quit"),
+    (430, "OBJECTIVE:"),
+    (460, "Collect all items while avoiding holes and obstacles."),
+    (490, "Don't stay on the same tile for too long!"),
+]
+
+def help_lines():
+    lines = [((1, 1, 1), 100, WINDOW_HEIGHT - dy, text) for dy, text in HELP_TEXT]
+    lines.append(((1, 1, 1), WINDOW_WIDTH // 2 - 100, 80, "Press any key to return"))
+    return lines
+
 def draw_help():
     glMatrixMode(GL_PROJECTION)
     glPushMatrix()
@@ -710,23 +983,7 @@ def draw_help():
     glVertex2f(50, 50)
     glEnd()
 
-    glColor3f(1, 1, 1)
-    draw_text(100, WINDOW_HEIGHT - 80, "CONTROLS:")
-    draw_text(100, WINDOW_HEIGHT - 110, "W/A/S/D - Move ball")
-    draw_text(100, WINDOW_HEIGHT - 140, "SPACE - Jump")
-    draw_text(100, WINDOW_HEIGHT - 170, "Arrow Keys - Rotate camera")
-    draw_text(100, WINDOW_HEIGHT - 200, "C - Change camera mode")
-    draw_text(100, WINDOW_HEIGHT - 230, "T - Change theme")
-    draw_text(100, WINDOW_HEIGHT - 260, "P - Pause game")
-    draw_text(100, WINDOW_HEIGHT - 290, "R - Restart game")
-    draw_text(100, WINDOW_HEIGHT - 320, "M - Toggle menu")
-    draw_text(100, WINDOW_HEIGHT - 350, "Q or ESC - Quit")
-
-    draw_text(100, WINDOW_HEIGHT - 400, "OBJECTIVE:")
-    draw_text(100, WINDOW_HEIGHT - 430, "Collect all items while avoiding holes and obstacles.")
-    draw_text(100, WINDOW_HEIGHT - 460, "Don't stay on the same tile for too long!")
-
-    draw_text(WINDOW_WIDTH // 2 - 100, 80, "Press any key to return")
+    draw_lines("help", None, help_lines)
 
     glDisable(GL_BLEND)
     glEnable(GL_LIGHTING)
@@ -754,11 +1011,12 @@ def draw_game_over():
     glVertex2f(WINDOW_WIDTH // 2 - 200, WINDOW_HEIGHT // 2 - 100)
     glEnd()
 
-    glColor3f(1, 1, 1)
-    draw_text(WINDOW_WIDTH // 2 - 70, WINDOW_HEIGHT // 2 + 50, "GAME OVER")
-    draw_text(WINDOW_WIDTH // 2 - 100, WINDOW_HEIGHT // 2, f"Score: {score}")
-    draw_text(WINDOW_WIDTH // 2 - 100, WINDOW_HEIGHT // 2 - 50, "Press R to Restart")
-    draw_text(WINDOW_WIDTH // 2 - 100, WINDOW_HEIGHT // 2 - 80, "Press M for Menu")
+    draw_lines("game_over", sim.state.score, lambda: [
+        ((1, 1, 1), WINDOW_WIDTH // 2 - 70, WINDOW_HEIGHT // 2 + 50, "GAME OVER"),
+        ((1, 1, 1), WINDOW_WIDTH // 2 - 100, WINDOW_HEIGHT // 2, f"Score: {sim.state.score}"),
+        ((1, 1, 1), WINDOW_WIDTH // 2 - 100, WINDOW_HEIGHT // 2 - 50, "Press R to Restart"),
+        ((1, 1, 1), WINDOW_WIDTH // 2 - 100, WINDOW_HEIGHT // 2 - 80, "Press M for Menu"),
+    ])
 
     glDisable(GL_BLEND)
     glEnable(GL_LIGHTING)
@@ -786,11 +1044,12 @@ def draw_win_screen():
     glVertex2f(WINDOW_WIDTH // 2 - 200, WINDOW_HEIGHT // 2 - 100)
     glEnd()
 
-    glColor3f(1, 1, 1)
-    draw_text(WINDOW_WIDTH // 2 - 50, WINDOW_HEIGHT // 2 + 50, "YOU WIN!")
-    draw_text(WINDOW_WIDTH // 2 - 100, WINDOW_HEIGHT // 2, f"Score: {score}")
-    draw_text(WINDOW_WIDTH // 2 - 100, WINDOW_HEIGHT // 2 - 50, "Press R to Restart")
-    draw_text(WINDOW_WIDTH // 2 - 100, WINDOW_HEIGHT // 2 - 80, "Press M for Menu")
+    draw_lines("win", sim.state.score, lambda: [
+        ((1, 1, 1), WINDOW_WIDTH // 2 - 50, WINDOW_HEIGHT // 2 + 50, "YOU WIN!"),
+        ((1, 1, 1), WINDOW_WIDTH // 2 - 100, WINDOW_HEIGHT // 2, f"Score: {sim.state.score}"),
+        ((1, 1, 1), WINDOW_WIDTH // 2 - 100, WINDOW_HEIGHT // 2 - 50, "Press R to Restart"),
+        ((1, 1, 1), WINDOW_WIDTH // 2 - 100, WINDOW_HEIGHT // 2 - 80, "Press M for Menu"),
+    ])
 
     glDisable(GL_BLEND)
     glEnable(GL_LIGHTING)
@@ -799,389 +1058,288 @@ def draw_win_screen():
     glPopMatrix()
     glMatrixMode(GL_MODELVIEW)
 
+def emit_particles(count, center, spread, vel_low, vel_high, color, size_range=(2, 5), life_range=(10, 30)):
+    """Write count particles into the ring buffer, overwriting the oldest."""
+    global particle_head
+    count = min(count, PARTICLE_CAPACITY)
+    if count <= 0:
+        return
+    idx = (particle_head + np.arange(count)) % PARTICLE_CAPACITY
+    particle_head = (particle_head + count) % PARTICLE_CAPACITY
+    rng = particle_rng
+    particle_pos[idx] = np.asarray(center) + rng.uniform(-1.0, 1.0, (count, 3)) * spread
+    particle_vel[idx] = rng.uniform(vel_low, vel_high, (count, 3))
+    particle_color[idx, :3] = color
+    particle_size[idx] = rng.uniform(size_range[0], size_range[1], count)
+    particle_life[idx] = rng.integers(life_range[0], life_range[1] + 1, count)
+
+def clear_particles():
+    global particle_head
+    particle_life[:] = 0
+    particle_head = 0
+
+def sync_particles():
+    """Drop the particles left over from before sim.reset_game() made a new level."""
+    global particle_level
+    if particle_level != sim.state.level_version:
+        clear_particles()
+        particle_level = sim.state.level_version
+
 def update_particles(dt):
-    global particles
-    for p in particles[:]:
-        p['pos'][0] += p['vel'][0] * dt
-        p['pos'][1] += p['vel'][1] * dt
-        p['pos'][2] += p['vel'][2] * dt
-        p['life'] -= 1
-        if p['life'] <= 0:
-            particles.remove(p)
+    sync_particles()
+    # Dead slots keep drifting too; that is cheaper than masking them out.
+    particle_pos[:] += particle_vel * dt
+    np.maximum(particle_life - 1, 0, out=particle_life)
     # Emit some trailing particles
-    if random.random() < 0.3:
-        particles.append({
-            'pos': [ball_pos[0] + random.uniform(-10, 10),
-                    ball_pos[1] + random.uniform(-10, 10),
-                    ball_pos[2] + random.uniform(-5, 5)],
-            'vel': [random.uniform(-5, 5), random.uniform(-5, 5), random.uniform(2, 5)],
-            'color': ball_color[:],
-            'size': random.uniform(2, 5),
-            'life': random.randint(10, 30)
-        })
+    rate = particle_trail_rate
+    count = int(rate) + (1 if particle_rng.random() < rate % 1 else 0)
+    emit_particles(count, sim.state.ball_pos, (10, 10, 5), (-5, -5, 2), (5, 5, 5), sim.state.ball_color)
 
+def draw_profiler_overlay():
+    rows = profiler.summary()
+    glMatrixMode(GL_PROJECTION)
+    glPushMatrix()
+    glLoadIdentity()
+    gluOrtho2D(0, WINDOW_WIDTH, 0, WINDOW_HEIGHT)
+    glMatrixMode(GL_MODELVIEW)
+    glPushMatrix()
+    glLoadIdentity()
+    glDisable(GL_LIGHTING)
+    glDisable(GL_DEPTH_TEST)
 
+    x = WINDOW_WIDTH - 460
+    y = 20 + 22 * (len(rows) + 1)
+    glColor3f(1, 1, 0)
+    draw_text(x, y, f"{'stage':<22}{'avg ms':>8}{'p99 ms':>8}{'calls':>7}{'verts':>8}", mono_font)
+    glColor3f(1, 1, 1)
+    for name, avg_ms, p99_ms, n_calls, n_vertices in rows:
+        y -= 22
+        draw_text(x, y, f"{name:<22}{avg_ms:>8.2f}{p99_ms:>8.2f}{n_calls:>7.0f}{n_vertices:>8.0f}", mono_font)
+    draw_text(x, 20 + 22 * (len(rows) + 2), f"Missed deadlines: {missed_deadlines}", mono_font)
+    drawn = sum(n for n, _ in cull_counts.values())
+    culled = sum(n for _, n in cull_counts.values())
+    draw_text(x, 20 + 22 * (len(rows) + 3), f"Frustum: {drawn} drawn, {culled} culled", mono_font)
 
+    glEnable(GL_DEPTH_TEST)
+    glEnable(GL_LIGHTING)
+    glPopMatrix()
+    glMatrixMode(GL_PROJECTION)
+    glPopMatrix()
+    glMatrixMode(GL_MODELVIEW)
 
-def update(dt):
-    global ball_pos, ball_vel, jumping, jump_start_time, score, lives, game_over, game_won
-    global last_tile, time_on_tile, show_timer, speed_multiplier, shield_active, shield_time
-    global speed_boost_active, speed_boost_timer, slow_trap_active, slow_trap_timer
-    global multiplier_active, multiplier_timer, multiplier_factor, ball_color, particles
-    global camera_angle, game_state, level
+def world_frame_key():
+    """Cache key for a static world frame, or None while the world moves."""
+    s = sim.state
+    if s.game_state == "playing" and not s.paused:
+        return None
+    return (s.tick_count, s.level_version, s.holes_version, s.game_state, s.paused,
+            theme, camera_mode, camera_angle, camera_height, WINDOW_WIDTH, WINDOW_HEIGHT)
+
+def capture_world():
+    global world_texture, world_texture_size
+    if world_texture is None:
+        world_texture = glGenTextures(1)
+    glBindTexture(GL_TEXTURE_2D, world_texture)
+    if world_texture_size != (WINDOW_WIDTH, WINDOW_HEIGHT):
+        glTexParameteri(GL_TEXTURE_2D, GL_TEXTURE_MIN_FILTER, GL_NEAREST)
+        glTexParameteri(GL_TEXTURE_2D, GL_TEXTURE_MAG_FILTER, GL_NEAREST)
+        glCopyTexImage2D(GL_TEXTURE_2D, 0, GL_RGB, 0, 0, WINDOW_WIDTH, WINDOW_HEIGHT, 0)
+        world_texture_size = (WINDOW_WIDTH, WINDOW_HEIGHT)
+    else:
+        glCopyTexSubImage2D(GL_TEXTURE_2D, 0, 0, 0, 0, 0, WINDOW_WIDTH, WINDOW_HEIGHT)
+    glBindTexture(GL_TEXTURE_2D, 0)
 
-    if game_state != "playing" or paused:
-        return
+def draw_world_cache():
+    glClear(GL_DEPTH_BUFFER_BIT)
+    glMatrixMode(GL_PROJECTION)
+    glPushMatrix()
+    glLoadIdentity()
+    gluOrtho2D(0, 1, 0, 1)
+    glMatrixMode(GL_MODELVIEW)
+    glPushMatrix()
+    glLoadIdentity()
+    glDisable(GL_LIGHTING)
+    glDisable(GL_DEPTH_TEST)
+    glDisable(GL_BLEND)
+    glEnable(GL_TEXTURE_2D)
+    glBindTexture(GL_TEXTURE_2D, world_texture)
 
-    # Timers / power-ups
-    if speed_boost_active:
-        speed_boost_timer -= dt
-        if speed_boost_timer <= 0:
-            speed_boost_active = False
-            speed_multiplier /= 1.5
-
-    if slow_trap_active:
-        slow_trap_timer -= dt
-        if slow_trap_timer <= 0:
-            slow_trap_active = False
-            speed_multiplier *= 2.0
-
-    if multiplier_active:
-        multiplier_timer -= dt
-        if multiplier_timer <= 0:
-            multiplier_active = False
-            multiplier_factor = 1
-
-    if shield_active:
-        shield_time -= dt
-        if shield_time <= 0:
-            shield_active = False
-
-    update_particles(dt)
-
-    # Movement (WASD standard axes)
-    move_dir = [
-        (-1 if move_keys['a'] else (1 if move_keys['d'] else 0)),  # x
-        (1 if move_keys['w'] else (-1 if move_keys['s'] else 0))   # y
-    ]
-    if move_dir[0] and move_dir[1]:
-        inv = 1.0 / math.sqrt(2.0)
-        move_dir[0] *= inv; move_dir[1] *= inv
-
-    base_speed = 200.0
-    ball_vel[0] = move_dir[0] * base_speed * speed_multiplier
-    ball_vel[1] = move_dir[1] * base_speed * speed_multiplier
-
-    # Jumping
-    on_ground = ball_pos[2] <= ball_radius + 0.001
-    if space_pressed and on_ground and not jumping:
-        jumping = True
-        jump_start_time = time.time()
-        ball_vel[2] = jump_strength
-    if jumping and (not space_pressed or (time.time() - jump_start_time) >= max_jump_duration):
-        jumping = False
-
-    # Gravity
-    ball_vel[2] += gravity * dt
-
-    # Integrate
-    ball_pos[0] += ball_vel[0] * dt
-    ball_pos[1] += ball_vel[1] * dt
-    ball_pos[2] += ball_vel[2] * dt
-
-    # Ground collision
-    if ball_pos[2] < ball_radius:
-        ball_pos[2] = ball_radius
-        ball_vel[2] = 0
-        jumping = False
-
-    # Walls
-    if ball_pos[0] < -half_size_x + ball_radius:
-        ball_pos[0] = -half_size_x + ball_radius; ball_vel[0] = -ball_vel[0] * 0.8
-    elif ball_pos[0] > half_size_x - ball_radius:
-        ball_pos[0] = half_size_x - ball_radius; ball_vel[0] = -ball_vel[0] * 0.8
-
-    if ball_pos[1] < -half_size_y + ball_radius:
-        ball_pos[1] = -half_size_y + ball_radius; ball_vel[1] = -ball_vel[1] * 0.8
-    elif ball_pos[1] > half_size_y - ball_radius:
-        ball_pos[1] = half_size_y - ball_radius; ball_vel[1] = -ball_vel[1] * 0.8
-
-    # Moving platforms
-    for platform in moving_platforms:
-        platform['pos'][0] += platform['vel'][0] * dt
-        platform['pos'][1] += platform['vel'][1] * dt
-        if platform['vel'][0] != 0 and (platform['pos'][0] < platform['limits'][0] or platform['pos'][0] > platform['limits'][1]):
-            platform['vel'][0] *= -1
-        if platform['vel'][1] != 0 and (platform['pos'][1] < platform['limits'][0] or platform['pos'][1] > platform['limits'][1]):
-            platform['vel'][1] *= -1
-        dx = abs(ball_pos[0] - platform['pos'][0])
-        dy = abs(ball_pos[1] - platform['pos'][1])
-        dz = abs(ball_pos[2] - platform['pos'][2])
-        if (dx < (platform['size'][0] / 2 + ball_radius) and 
-            dy < (platform['size'][1] / 2 + ball_radius) and 
-            dz < (platform['size'][2] / 2 + ball_radius) and
-            ball_pos[2] > platform['pos'][2]):
-            ball_pos[2] = platform['pos'][2] + platform['size'][2] / 2 + ball_radius
-            ball_vel[2] = 0
-            jumping = False
-
-    # Teleporters
-    for tele in teleporters:
-        dx = ball_pos[0] - tele['pos'][0]
-        dy = ball_pos[1] - tele['pos'][1]
-        dz = ball_pos[2] - tele['pos'][2]
-        if math.sqrt(dx*dx + dy*dy + dz*dz) < ball_radius + 15:
-            ball_pos[0], ball_pos[1], ball_pos[2] = tele['target']
-
-    # Obstacles
-    for o in obstacles:
-        dx = ball_pos[0] - o['pos'][0]
-        dy = ball_pos[1] - o['pos'][1]
-        dz = ball_pos[2] - o['pos'][2]
-        if math.sqrt(dx*dx + dy*dy + dz*dz) < ball_radius + o['size']:
-            if shield_active:
-                shield_active = False
-            else:
-                lives -= 1
-                if lives <= 0:
-                    game_state = "game_over"
-                else:
-                    reset_game(reset_score=False, reset_lives=False)
-                break
-
-    # Power-ups
-    for boost in speed_boosts:
-        if boost['active']:
-            dx = ball_pos[0] - boost['pos'][0]
-            dy = ball_pos[1] - boost['pos'][1]
-            dz = ball_pos[2] - boost['pos'][2]
-            if math.sqrt(dx*dx + dy*dy + dz*dz) < ball_radius + 10:
-                boost['active'] = False
-                speed_boost_active = True
-                speed_boost_timer = boost['duration']
-                speed_multiplier *= 1.5
-
-    for trap in slow_traps:
-        if trap['active']:
-            dx = ball_pos[0] - trap['pos'][0]
-            dy = ball_pos[1] - trap['pos'][1]
-            dz = ball_pos[2] - trap['pos'][2]
-            if math.sqrt(dx*dx + dy*dy + dz*dz) < ball_radius + 10:
-                trap['active'] = False
-                slow_trap_active = True
-                slow_trap_timer = trap['duration']
-                speed_multiplier /= 2.0
-
-    for bonus in time_bonuses:
-        if bonus['active']:
-            dx = ball_pos[0] - bonus['pos'][0]
-            dy = ball_pos[1] - bonus['pos'][1]
-            dz = ball_pos[2] - bonus['pos'][2]
-            if math.sqrt(dx*dx + dy*dy + dz*dz) < ball_radius + 10:
-                bonus['active'] = False
-                # reduce time spent on current tile
-                global time_on_tile
-                time_on_tile = max(0, time_on_tile - bonus['time'])
-
-    for life in life_collectibles:
-        if life['active']:
-            dx = ball_pos[0] - life['pos'][0]
-            dy = ball_pos[1] - life['pos'][1]
-            dz = ball_pos[2] - life['pos'][2]
-            if math.sqrt(dx*dx + dy*dy + dz*dz) < ball_radius + 10:
-                life['active'] = False
-                lives += 1
-
-    for mult in multipliers:
-        if mult['active']:
-            dx = ball_pos[0] - mult['pos'][0]
-            dy = ball_pos[1] - mult['pos'][1]
-            dz = ball_pos[2] - mult['pos'][2]
-            if math.sqrt(dx*dx + dy*dy + dz*dz) < ball_radius + 10:
-                mult['active'] = False
-                multiplier_active = True
-                multiplier_timer = mult['duration']
-                multiplier_factor = mult['factor']
-
-    for shield in shields:
-        if not shield['collected']:
-            dx = ball_pos[0] - shield['pos'][0]
-            dy = ball_pos[1] - shield['pos'][1]
-            dz = ball_pos[2] - shield['pos'][2]
-            if math.sqrt(dx*dx + dy*dy + dz*dz) < ball_radius + 15:
-                shield['collected'] = True
-                shield_active = True
-                shield_time = 10.0
-
-    # Collectibles
-    remaining = []
-    for c in collectibles:
-        dx = ball_pos[0] - c['pos'][0]
-        dy = ball_pos[1] - c['pos'][1]
-        dz = ball_pos[2] - c['pos'][2]
-        if math.sqrt(dx*dx + dy*dy + dz*dz) < ball_radius + 15:
-            global score
-            score += 1 * multiplier_factor
-        else:
-            remaining.append(c)
-    collectibles[:] = remaining
-
-    # Special points
-    for sp in special_points:
-        if not sp['collected']:
-            dx = ball_pos[0] - sp['pos'][0]
-            dy = ball_pos[1] - sp['pos'][1]
-            dz = ball_pos[2] - sp['pos'][2]
-            if math.sqrt(dx*dx + dy*dy + dz*dz) < ball_radius + 15:
-                score += 5 * multiplier_factor
-                sp['collected'] = True
-
-    # Holes
-    i = int((ball_pos[0] + half_size_x) // tile_size)
-    j = int((ball_pos[1] + half_size_y) // tile_size)
-    if 0 <= i < grid_size_x and 0 <= j < grid_size_y and ball_pos[2] <= ball_radius + 1:
-        if (i, j) in holes:
-            if shield_active:
-                shield_active = False
-            else:
-                lives -= 1
-                if lives <= 0:
-                    game_state = "game_over"
-                else:
-                    reset_game(reset_score=False, reset_lives=False)
-
-    # Tile timer (discourage camping)
-    if 0 <= i < grid_size_x and 0 <= j < grid_size_y and (i, j) not in holes:
-        if ball_pos[2] <= ball_radius + 1:
-            if (i, j) == last_tile:
-                time_on_tile += dt
-                show_timer = True
-                if time_on_tile >= max_tile_time:
-                    lives -= 1
-                    time_on_tile = 0.0
-                    last_tile = None
-                    show_timer = False
-                    if lives <= 0:
-                        game_state = "game_over"
-                    else:
-                        reset_game(reset_score=False, reset_lives=False)
-            else:
-                last_tile = (i, j)
-                time_on_tile = 0.0
-                show_timer = True
-    else:
-        last_tile = None
-        time_on_tile = 0.0
-        show_timer = False
-
-    # Win condition
-    if len(collectibles) == 0 and all(sp['collected'] for sp in special_points):
-        if level < max_level:
-            level += 1
-            reset_game(reset_score=False, reset_lives=False)
-        else:
-            game_state = "win"
-
-    # Ball color by power-ups
-    if speed_boost_active:
-        ball_color[:] = [0.0, 0.0, 1.0]
-    elif slow_trap_active:
-        ball_color[:] = [1.0, 0.0, 1.0]
-    elif multiplier_active:
-        ball_color[:] = [1.0, 1.0, 0.0]
-    elif shield_active:
-        ball_color[:] = [0.0, 1.0, 1.0]
+    glColor4f(1, 1, 1, 1)
+    glBegin(GL_QUADS)
+    glTexCoord2f(0, 0); glVertex2f(0, 0)
+    glTexCoord2f(1, 0); glVertex2f(1, 0)
+    glTexCoord2f(1, 1); glVertex2f(1, 1)
+    glTexCoord2f(0, 1); glVertex2f(0, 1)
+    glEnd()
+
+    glBindTexture(GL_TEXTURE_2D, 0)
+    glDisable(GL_TEXTURE_2D)
+    glEnable(GL_DEPTH_TEST)
+    glEnable(GL_LIGHTING)
+    glPopMatrix()
+    glMatrixMode(GL_PROJECTION)
+    glPopMatrix()
+    glMatrixMode(GL_MODELVIEW)
+
+def toggle_profiler():
+    profiler.enabled = not profiler.enabled
+    if profiler.enabled:
+        profiler.reset()
+        profiler.instrument(globals())
     else:
-        ball_color[:] = [1.0, 0.2, 0.2]
+        profiler.uninstrument(globals())
 
 def display():
-    setup_scene()
-    glEnable(GL_DEPTH_TEST)
-    draw_skybox()
-    draw_floor()
-    draw_walls()
-    draw_moving_platforms()
-    draw_teleporters()
-    draw_power_ups()
-    draw_collectibles()
-    draw_special_points()
-    draw_obstacles()
-    draw_ball()
-    draw_particles()
-    draw_hud()
-
-    if game_state == "menu":
-        draw_menu()
-    elif game_state == "help":
-        draw_help()
-    elif game_state == "game_over":
-        draw_game_over()
-    elif game_state == "win":
-        draw_win_screen()
+    global world_key
+    cull_counts.clear()
+    key = world_frame_key()
+    if key is not None and key == world_key:
+        with profiler.stage("draw_world_cache"):
+            draw_world_cache()
+    else:
+        with profiler.stage("setup_scene"):
+            setup_scene()
+        glEnable(GL_DEPTH_TEST)
+        for draw in WORLD_PASSES:
+            with profiler.stage(draw.__name__):
+                draw()
+        if key is not None:
+            capture_world()
+        world_key = key
+
+    with profiler.stage("draw_hud"):
+        draw_hud()
+    overlay = SCREEN_OVERLAYS.get(sim.state.game_state)
+    if overlay is not None:
+        with profiler.stage(overlay.__name__):
+            overlay()
+
+    if profiler.enabled:
+        draw_profiler_overlay()
+    profiler.end_frame()
 
     glutSwapBuffers()
 
+WORLD_PASSES = [
+    draw_skybox, draw_floor, draw_walls, draw_moving_platforms, draw_teleporters,
+    draw_power_ups, draw_collectibles, draw_special_points, draw_obstacles,
+    draw_enemies, draw_ball, draw_particles,
+]
+SCREEN_OVERLAYS = {
+    "menu": draw_menu,
+    "help": draw_help,
+    "game_over": draw_game_over,
+    "win": draw_win_screen,
+}
+
 def idle():
     global time_last
     now = time.time()
     dt = now - time_last
     time_last = now
 
-    # Clamp dt to avoid huge steps when window regains focus
-    if dt > 0.05:
-        dt = 0.05
-
-    if game_state == "playing" and not paused:
-        update(dt)
+    if rewinding:
+        with profiler.stage("rewind"):
+            sim.history.back(max(1, round(dt * sim.tick_rate * rewind_speed)))
+        glutPostRedisplay()
+        return
 
-    glutPostRedisplay()
+    # Fixed-step physics; sim.advance() caps catch-up after long stalls
+    with profiler.stage("update"):
+        sim.advance(dt)
+    if sim.state.game_state == "playing" and not sim.state.paused:
+        with profiler.stage("update_particles"):
+            update_particles(min(dt, 0.05))
+
+    # A cached static frame only needs redrawing when something it shows
+    # changes; key handlers and reshape post their own redisplays.
+    if world_key is None or world_frame_key() != world_key or profiler.enabled:
+        glutPostRedisplay()
+
+def frame_interval():
+    if rewinding:
+        return 1.0 / target_fps
+    if sim.state.game_state != "playing" or sim.state.paused:
+        return 1.0 / idle_fps
+    return 1.0 / target_fps
+
+def frame_timer(value=0):
+    """Paced replacement for glutIdleFunc: one frame per interval, then sleep."""
+    global next_frame_time, missed_deadlines
+    now = time.perf_counter()
+    interval = frame_interval()
+    if next_frame_time is None:
+        next_frame_time = now
+    elif now - next_frame_time > interval:
+        missed_deadlines += 1
+
+    idle()
+
+    # Late frames reschedule from now rather than bursting to catch up
+    next_frame_time = max(next_frame_time + interval, now)
+    delay_ms = int((next_frame_time - time.perf_counter()) * 1000)
+    glutTimerFunc(max(0, delay_ms), frame_timer, 0)
 
 def keyboard(key, x, y):
-    global space_pressed, theme, camera_mode, paused, game_state
+    global theme, camera_mode, rewinding
     key = key.decode('utf-8').lower()
 
-    if game_state == "menu":
+    if key == 'b' and sim.history is not None and sim.state.game_state in ["playing", "game_over", "win"]:
+        rewinding = True
+    elif sim.state.game_state == "menu":
         if key == ' ':
-            reset_game()
+            sim.command("reset")
         elif key == 'h':
-            game_state = "help"
+            sim.command("help")
         elif key in ['q', '\x1b']:  # 'q' or ESC
             sys.exit(0)
-    elif game_state == "help":
-        game_state = "menu"
-    elif game_state == "playing":
+    elif sim.state.game_state == "help":
+        sim.command("menu")
+    elif sim.state.game_state == "playing":
         if key == ' ':
-            space_pressed = True
+            sim.state.space_pressed = True
         elif key in ['a', 'd', 'w', 's']:
-            move_keys[key] = True
+            sim.state.move_keys[key] = True
         elif key == 'p':
-            paused = not paused
+            sim.command("pause")
         elif key == 'r':
-            reset_game()
+            sim.command("reset")
         elif key == 't':
             idx = themes.index(theme)
             theme = themes[(idx + 1) % len(themes)]
         elif key == 'c':
             camera_mode = "overhead" if camera_mode == "follow" else ("first_person" if camera_mode == "overhead" else "follow")
         elif key == 'm':
-            game_state = "menu"
+            sim.command("menu")
+        elif key == 'f':
+            toggle_profiler()
+        elif key == 'e' and profiler.enabled:
+            path = profiler.export_csv(time.strftime("profile_%Y%m%d_%H%M%S.csv"))
+            print(f"Profile written to {path}")
         elif key in ['q', '\x1b']:
             sys.exit(0)
-    elif game_state in ["game_over", "win"]:
+    elif sim.state.game_state in ["game_over", "win"]:
         if key == 'r':
-            reset_game()
+            sim.command("reset")
         elif key == 'm':
-            game_state = "menu"
+            sim.command("menu")
         elif key in ['q', '\x1b']:
             sys.exit(0)
 
+    # Show the result now instead of at the next (possibly slow) idle frame
+    glutPostRedisplay()
+
 def keyboard_up(key, x, y):
-    global space_pressed
+    global rewinding
     key = key.decode('utf-8').lower()
-    if key == ' ':
-        space_pressed = False
+    if key == 'b' and rewinding:
+        # Resume from here; inputs restored from the past may not be held now
+        rewinding = False
+        sim.set_input(keys="", space=False)
+    elif key == ' ':
+        sim.state.space_pressed = False
     elif key in ['a', 'd', 'w', 's']:
-        move_keys[key] = False
+        sim.state.move_keys[key] = False
 
 def special(key, x, y):
     global camera_angle, camera_height
@@ -1195,6 +1353,7 @@ def special(key, x, y):
         camera_height -= 20
     camera_angle %= 360
     camera_height = max(100, min(1000, camera_height))
+    glutPostRedisplay()
 
 def init_gl():
     glEnable(GL_DEPTH_TEST)
@@ -1202,17 +1361,26 @@ def init_gl():
     glBlendFunc(GL_SRC_ALPHA, GL_ONE_MINUS_SRC_ALPHA)
     setup_projection()
     setup_lighting()
+    build_mesh_cache()
     # Nice default clear
     glClearColor(0.5, 0.8, 1.0, 1.0)
 
 def main():
-    glutInit(sys.argv)  # <-- FIX: pass argv
+    parser = argparse.ArgumentParser(description="Sphere Quest")
+    parser.add_argument("--seed", type=int, help="seed the level generator")
+    parser.add_argument("--record", metavar="PATH", help="record inputs for replay.py on exit")
+    parser.add_argument("--grid", metavar="WxH", help="tile grid size (default 30x20)")
+    parser.add_argument("--rewind", type=float, default=30.0, metavar="SECONDS",
+                        help="history kept for rewinding with B (0 turns it off; off while recording)")
+    args, glut_args = parser.parse_known_args()
+
+    glutInit([sys.argv[0]] + glut_args)  # <-- FIX: pass argv
     glutInitDisplayMode(GLUT_DOUBLE | GLUT_RGB | GLUT_DEPTH)
     glutInitWindowSize(WINDOW_WIDTH, WINDOW_HEIGHT)
     glutCreateWindow(b"Beautiful 3D Ball Game")
     glutReshapeFunc(reshape)
     glutDisplayFunc(display)
-    glutIdleFunc(idle)
+    glutTimerFunc(0, frame_timer, 0)
     glutKeyboardFunc(keyboard)
     glutKeyboardUpFunc(keyboard_up)
     glutSpecialFunc(special)
@@ -1220,8 +1388,18 @@ def main():
     init_gl()
 
     # Initialize game
-    generate_holes()
-    reset_game()
+    if args.grid:
+        sim.configure_grid(*(int(v) for v in args.grid.lower().split("x")))
+    if args.record:
+        recorder = replay.start_recording(args.seed)
+        atexit.register(recorder.save, args.record)
+        # Let closing the window return from glutMainLoop so the recording is saved
+        if bool(glutSetOption):
+            glutSetOption(GLUT_ACTION_ON_WINDOW_CLOSE, GLUT_ACTION_GLUTMAINLOOP_RETURNS)
+    else:
+        sim.start(args.seed)
+        if args.rewind > 0:
+            sim.history = rewind.History(args.rewind)
 
     glutMainLoop()
 
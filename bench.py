@@ -0,0 +1,127 @@
+"""Offscreen rendering benchmark for Sphere Quest.
+
+    python bench.py [--frames N] [--size WxH] [--out bench.json] [--egl]
+
+Renders app.display() for a fixed set of scenes (every camera mode, several
+themes, levels 1, 5 and 10) with a fixed RNG seed and a scripted camera, and
+prints frames per second, per-stage timings and frustum-culling counts as
+JSON.
+
+The context comes from offscreen.py: a hidden GLUT window with an X display,
+otherwise (or with --egl) an EGL pbuffer with freeglut's solids and bitmap
+text replaced by stand-ins; the JSON records this as "glut": "substituted".
+"""
+import argparse, json, math, os, sys, time
+
+SEED = 1234
+LEVELS = (1, 5, 10)
+THEMES = ("default", "space", "lava")
+CAMERA_MODES = ("follow", "overhead", "first_person")
+
+if "--egl" in sys.argv:
+    # offscreen reads this on import, before the first OpenGL import
+    os.environ["PYOPENGL_PLATFORM"] = "egl"
+
+from offscreen import create_context, use_egl
+
+from OpenGL.GL import GL_RENDERER, GL_VERSION, glFinish, glGetString
+import numpy as np
+
+import app, profiler, sim
+
+# ---------------------------
+# Scenes
+# ---------------------------
+def setup_scene(level, theme, camera_mode):
+    sim.start(seed=SEED, start_level=level)
+    app.particle_rng = np.random.default_rng(SEED)
+    app.clear_particles()
+    app.theme = theme
+    app.camera_mode = camera_mode
+    app.camera_angle = 45
+    app.camera_height = 300.0
+
+def script_frame(frame, frames):
+    """Move the ball around a circle and orbit the camera with it."""
+    t = frame / frames
+    angle = 2 * math.pi * t
+    sim.state.ball_pos[:] = [300 * math.cos(angle), 200 * math.sin(angle), sim.ball_radius]
+    sim.state.prev_ball_pos[:] = sim.state.ball_pos
+    app.camera_angle = (45 + 360 * t) % 360
+    app.camera_height = 200 + 200 * math.sin(angle)
+    app.update_particles(1.0 / 60.0)
+
+def run_frames(frames):
+    times = []
+    for frame in range(frames):
+        script_frame(frame, frames)
+        t0 = time.perf_counter()
+        app.display()
+        glFinish()
+        times.append(time.perf_counter() - t0)
+    return times
+
+def bench_scene(level, theme, camera_mode, frames, warmup):
+    setup_scene(level, theme, camera_mode)
+    run_frames(warmup)
+
+    # Plain pass for FPS, then an instrumented pass for the stage breakdown
+    times = sorted(run_frames(frames))
+    app.toggle_profiler()
+    setup_scene(level, theme, camera_mode)
+    run_frames(frames)
+    stages = {name: {"avg_ms": round(avg, 4), "p99_ms": round(p99, 4),
+                     "gl_calls": round(n_calls, 1), "vertices": round(n_vertices, 1)}
+              for name, avg, p99, n_calls, n_vertices in profiler.summary()}
+    app.toggle_profiler()
+    culling = {name: {"drawn": drawn, "culled": culled}
+               for name, (drawn, culled) in sorted(app.cull_counts.items())}
+
+    total = sum(times)
+    return {
+        "level": level,
+        "theme": theme,
+        "camera_mode": camera_mode,
+        "fps": round(frames / total, 2),
+        "frame_ms_avg": round(total / frames * 1000, 4),
+        "frame_ms_p99": round(profiler.p99(times) * 1000, 4),
+        "stages": stages,
+        "culling": culling,  # last frame
+    }
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.split("\n\n")[0])
+    parser.add_argument("--frames", type=int, default=120)
+    parser.add_argument("--warmup", type=int, default=10)
+    parser.add_argument("--size", default="640x480", help="WIDTHxHEIGHT")
+    parser.add_argument("--out", help="write JSON here as well as to stdout")
+    parser.add_argument("--egl", action="store_true", help="force EGL even with an X display")
+    args = parser.parse_args()
+    width, height = (int(v) for v in args.size.lower().split("x"))
+
+    create_context(width, height, app)
+
+    scenes = [bench_scene(level, theme, mode, args.frames, args.warmup)
+              for level in LEVELS for theme in THEMES for mode in CAMERA_MODES]
+    result = {
+        "meta": {
+            "renderer": glGetString(GL_RENDERER).decode(),
+            "gl_version": glGetString(GL_VERSION).decode(),
+            "backend": "egl" if use_egl else "glut",
+            "glut": "substituted" if use_egl else "native",
+            "size": [width, height],
+            "frames": args.frames,
+            "seed": SEED,
+            "python": sys.version.split()[0],
+            "timestamp": time.strftime("%Y-%m-%dT%H:%M:%S"),
+        },
+        "scenes": scenes,
+    }
+    text = json.dumps(result, indent=2)
+    if args.out:
+        with open(args.out, "w") as f:
+            f.write(text + "\n")
+    print(text)
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,104 @@
+"""reset()/step() wrapper around one headless Sphere Quest game.
+
+    env = GameEnv(pixels=True)          # 84x84 RGB rendered offscreen
+    obs, info = env.reset(seed=3)
+    obs, reward, terminated, truncated, info = env.step(KEY_BITS['w'] | SPACE_BIT)
+
+An action is a replay.KEY_BITS | SPACE_BIT mask, applied to
+sim.state.move_keys and sim.state.space_pressed for frame_skip ticks; the
+reward is the score gained.
+obs["state"] is float32 in vecenv.OBS_FIELDS order.  With pixels=True,
+obs["pixels"] is an (h, w, 3) uint8 view of the world (no HUD) drawn into a
+framebuffer object and read straight into a buffer that every step reuses:
+copy it if you keep it.
+
+The game is sim.state, a single module-level object, so there is one
+GameEnv per process; run several processes (as rollout.py does) or use
+vecenv.VecEnv for state-only batches.
+"""
+import numpy as np
+
+import replay, sim
+from vecenv import OBS_FIELDS
+
+class GameEnv:
+    """One game; pixels needs an OpenGL context, which the first GameEnv creates."""
+
+    def __init__(self, pixels=False, size=(84, 84), camera_mode="follow", theme="default",
+                 frame_skip=1, max_seconds=600.0, dt=None):
+        self.frame_skip = frame_skip
+        self.max_seconds = max_seconds
+        self.dt = 1.0 / sim.tick_rate if dt is None else dt
+        self.state = np.zeros(len(OBS_FIELDS), dtype=np.float32)
+        self.framebuffer = None
+        if pixels:
+            self.open_framebuffer(size, camera_mode, theme)
+
+    def open_framebuffer(self, size, camera_mode, theme):
+        # offscreen picks the OpenGL platform, so it must be imported before app
+        global app, offscreen
+        import offscreen, app
+        width, height = size
+        if not app.mesh_lists:
+            offscreen.create_context(width, height, app)
+        self.framebuffer = offscreen.Framebuffer(width, height)
+        app.camera_mode = camera_mode
+        app.theme = theme
+
+    # ---------------------------
+    # Episodes
+    # ---------------------------
+    def reset(self, seed=None, start_level=1):
+        sim.recorder = None
+        sim.start(seed=seed, start_level=start_level)
+        sim.state.render_alpha = 1.0
+        if self.framebuffer is not None:
+            app.particle_life[:] = 0
+        return self.observe(), self.info()
+
+    def step(self, action):
+        """Returns (obs, reward, terminated, truncated, info)."""
+        replay.apply_input_bits(int(action))
+        score = sim.state.score
+        for _ in range(self.frame_skip):
+            if sim.state.game_state != "playing":
+                break
+            sim.tick(self.dt)
+        terminated = sim.state.game_state != "playing"
+        truncated = not terminated and sim.clock.now() >= self.max_seconds
+        return self.observe(), sim.state.score - score, terminated, truncated, self.info()
+
+    def info(self):
+        g = sim.state
+        return {"score": g.score, "level": g.level, "lives": g.lives,
+                "game_state": g.game_state, "tick": g.tick_count}
+
+    # ---------------------------
+    # Observations
+    # ---------------------------
+    def observe(self):
+        s, g = self.state, sim.state
+        s[0:3] = g.ball_pos
+        s[3:6] = g.ball_vel
+        s[6] = g.lives
+        s[7] = g.level
+        s[8] = g.goals_left
+        s[9] = g.time_on_tile
+        s[10] = g.speed_multiplier
+        s[11] = g.shield_time if g.shield_active else 0.0
+        obs = {"state": s}
+        if self.framebuffer is not None:
+            obs["pixels"] = self.render()
+        return obs
+
+    def render(self):
+        """Draw the world into the framebuffer and read it back; returns framebuffer.pixels."""
+        fb = self.framebuffer
+        fb.bind()
+        app.reshape(fb.width, fb.height)
+        app.cull_counts.clear()
+        app.setup_scene()
+        offscreen.glEnable(offscreen.GL_DEPTH_TEST)
+        for draw in app.WORLD_PASSES:
+            draw()
+        return fb.read()
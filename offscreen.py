@@ -0,0 +1,178 @@
+"""Windowless OpenGL contexts and framebuffers for bench.py and gameenv.py.
+
+Import this before anything else that imports OpenGL.  With an X display the
+game's own GLUT setup is used with a hidden window.  Without one (or with
+PYOPENGL_PLATFORM=egl) frames go to an EGL pbuffer, which Mesa's llvmpipe
+provides on a plain Linux box with no GPU.  freeglut cannot draw without a
+window, so in that mode its solids are replaced by GLU quadrics (teapots by
+spheres) and bitmap text by blank glBitmap calls of the same width.
+"""
+import ctypes, math, os, sys
+
+use_egl = os.environ.get("PYOPENGL_PLATFORM") == "egl" or not os.environ.get("DISPLAY")
+if use_egl:
+    # Must be set before the first OpenGL import
+    os.environ.setdefault("PYOPENGL_PLATFORM", "egl")
+    os.environ.setdefault("EGL_PLATFORM", "surfaceless")
+
+from OpenGL.GL import *
+from OpenGL.GLU import *
+from OpenGL.GLUT import *
+
+import numpy as np
+
+# ---------------------------
+# Contexts
+# ---------------------------
+def create_egl_context(width, height):
+    from OpenGL import EGL
+    display = EGL.eglGetDisplay(EGL.EGL_DEFAULT_DISPLAY)
+    if not EGL.eglInitialize(display, None, None):
+        raise RuntimeError("eglInitialize failed")
+    config = EGL.EGLConfig()
+    count = EGL.EGLint()
+    attrs = (EGL.EGLint * 9)(EGL.EGL_SURFACE_TYPE, EGL.EGL_PBUFFER_BIT,
+                             EGL.EGL_RENDERABLE_TYPE, EGL.EGL_OPENGL_BIT,
+                             EGL.EGL_DEPTH_SIZE, 24, EGL.EGL_NONE, 0, 0)
+    EGL.eglChooseConfig(display, attrs, ctypes.pointer(config), 1, ctypes.pointer(count))
+    if count.value < 1:
+        raise RuntimeError("no EGL config with desktop OpenGL and a depth buffer")
+    EGL.eglBindAPI(EGL.EGL_OPENGL_API)
+    surface = EGL.eglCreatePbufferSurface(
+        display, config, (EGL.EGLint * 5)(EGL.EGL_WIDTH, width, EGL.EGL_HEIGHT, height, EGL.EGL_NONE))
+    context = EGL.eglCreateContext(display, config, EGL.EGL_NO_CONTEXT, None)
+    if not EGL.eglMakeCurrent(display, surface, surface, context):
+        raise RuntimeError("eglMakeCurrent failed")
+
+def create_glut_context(width, height, title=b"Sphere Quest (offscreen)"):
+    glutInit(sys.argv[:1])
+    glutInitDisplayMode(GLUT_DOUBLE | GLUT_RGB | GLUT_DEPTH)
+    glutInitWindowSize(width, height)
+    glutCreateWindow(title)
+    glutHideWindow()
+
+def create_context(width, height, app):
+    """Make a context current and ready app to draw into it."""
+    if use_egl:
+        create_egl_context(width, height)
+        substitute_glut(app)
+    else:
+        create_glut_context(width, height)
+    app.init_gl()
+    app.reshape(width, height)
+
+# ---------------------------
+# GLUT stand-ins for EGL
+# ---------------------------
+quadric = None
+stand_in_lists = {}  # (function, args) -> display list
+
+def compiled(draw):
+    """Replay draw(*args) from a display list built on its first call."""
+    def call(*args):
+        key = (draw, args)
+        if key not in stand_in_lists:
+            if glGetIntegerv(GL_LIST_INDEX):
+                draw(*args)  # already inside the caller's glNewList
+                return
+            stand_in_lists[key] = glGenLists(1)
+            glNewList(stand_in_lists[key], GL_COMPILE)
+            draw(*args)
+            glEndList()
+        glCallList(stand_in_lists[key])
+    return call
+
+def solid_sphere(radius, slices, stacks):
+    gluSphere(quadric, radius, slices, stacks)
+
+def solid_cone(base, height, slices, stacks):
+    gluCylinder(quadric, base, 0.0, height, slices, stacks)
+    glPushMatrix()
+    glRotatef(180, 1, 0, 0)
+    gluDisk(quadric, 0.0, base, slices, 1)
+    glPopMatrix()
+
+def solid_cube(size):
+    h = size / 2.0
+    glBegin(GL_QUADS)
+    for axis in range(3):
+        for sign in (-1.0, 1.0):
+            normal = [0.0, 0.0, 0.0]
+            normal[axis] = sign
+            glNormal3f(*normal)
+            u, v = (axis + 1) % 3, (axis + 2) % 3
+            for du, dv in ((-1, -1), (1, -1), (1, 1), (-1, 1)):
+                p = [0.0, 0.0, 0.0]
+                p[axis], p[u], p[v] = sign * h, du * sign * h, dv * h
+                glVertex3f(*p)
+    glEnd()
+
+def solid_torus(inner, outer, sides, rings):
+    for i in range(rings):
+        glBegin(GL_QUAD_STRIP)
+        for j in range(sides + 1):
+            phi = j * 2 * math.pi / sides
+            for k in (i, i + 1):
+                theta = k * 2 * math.pi / rings
+                nx, ny, nz = math.cos(theta) * math.cos(phi), math.sin(theta) * math.cos(phi), math.sin(phi)
+                r = outer + inner * math.cos(phi)
+                glNormal3f(nx, ny, nz)
+                glVertex3f(math.cos(theta) * r, math.sin(theta) * r, inner * math.sin(phi))
+        glEnd()
+
+blank_glyph = bytes(2 * 15)
+
+def bitmap_character(face, ch):
+    glBitmap(10, 15, 0, 0, 10, 0, blank_glyph)
+
+def substitute_glut(app):
+    global quadric
+    quadric = gluNewQuadric()
+    gluQuadricNormals(quadric, GLU_SMOOTH)
+    stand_ins = {
+        'glutSolidSphere': compiled(solid_sphere),
+        'glutSolidCone': compiled(solid_cone),
+        'glutSolidCube': compiled(solid_cube),
+        'glutSolidTorus': compiled(solid_torus),
+        'glutSolidTeapot': compiled(lambda size: solid_sphere(size, 16, 16)),
+        'glutBitmapCharacter': bitmap_character,
+        'glutSwapBuffers': lambda: None,
+    }
+    vars(app).update(stand_ins)
+
+# ---------------------------
+# Framebuffers
+# ---------------------------
+class Framebuffer:
+    """An RGB + depth framebuffer object whose pixels read into one NumPy buffer."""
+
+    def __init__(self, width, height):
+        self.width = width
+        self.height = height
+        self.fbo = glGenFramebuffers(1)
+        self.color, self.depth = glGenRenderbuffers(2)
+        glBindRenderbuffer(GL_RENDERBUFFER, self.color)
+        glRenderbufferStorage(GL_RENDERBUFFER, GL_RGB8, width, height)
+        glBindRenderbuffer(GL_RENDERBUFFER, self.depth)
+        glRenderbufferStorage(GL_RENDERBUFFER, GL_DEPTH_COMPONENT24, width, height)
+        glBindRenderbuffer(GL_RENDERBUFFER, 0)
+        glBindFramebuffer(GL_FRAMEBUFFER, self.fbo)
+        glFramebufferRenderbuffer(GL_FRAMEBUFFER, GL_COLOR_ATTACHMENT0, GL_RENDERBUFFER, self.color)
+        glFramebufferRenderbuffer(GL_FRAMEBUFFER, GL_DEPTH_ATTACHMENT, GL_RENDERBUFFER, self.depth)
+        status = glCheckFramebufferStatus(GL_FRAMEBUFFER)
+        glBindFramebuffer(GL_FRAMEBUFFER, 0)
+        if status != GL_FRAMEBUFFER_COMPLETE:
+            raise RuntimeError(f"framebuffer incomplete: 0x{status:x}")
+        # Rows bottom-up as GL returns them; pixels is the same memory top-down
+        self.buffer = np.zeros((height, width, 3), dtype=np.uint8)
+        self.pixels = self.buffer[::-1]
+
+    def bind(self):
+        glBindFramebuffer(GL_FRAMEBUFFER, self.fbo)
+        glViewport(0, 0, self.width, self.height)
+
+    def read(self):
+        """Read the bound framebuffer into self.buffer; returns self.pixels (no copy)."""
+        glPixelStorei(GL_PACK_ALIGNMENT, 1)
+        glReadPixels(0, 0, self.width, self.height, GL_RGB, GL_UNSIGNED_BYTE, self.buffer)
+        return self.pixels
@@ -0,0 +1,146 @@
+"""Frame profiler for Sphere Quest.
+
+Times named stages with perf_counter and, while instrumented, counts GL calls
+and submitted vertices per stage.  Keeps a rolling window of frames for the
+HUD overlay (average and p99) and can dump that window to CSV.
+"""
+import csv, time
+from collections import deque
+
+HISTORY = 300  # frames kept for rolling stats / CSV export
+
+enabled = False
+calls = 0
+vertices = 0
+list_vertices = {}   # display list id -> vertices it submits
+frame_no = 0
+frame_samples = {}   # stage -> [ms, calls, vertices] for the frame in progress
+history = deque(maxlen=HISTORY)  # (frame_no, {stage: (ms, calls, vertices)})
+
+# Vertices per call for functions that submit geometry.  GLUT solids are
+# estimates from their tessellation arguments (triangle strips per stack).
+VERTEX_COUNTS = {
+    'glDrawArrays': lambda a: a[2],
+    'glCallList': lambda a: list_vertices.get(a[0], 0),
+    'glutSolidSphere': lambda a: 2 * a[1] * (a[2] + 1),
+    'glutSolidCone': lambda a: 2 * a[2] * (a[3] + 1) + a[2] + 2,
+    'glutSolidTorus': lambda a: 2 * a[2] * (a[3] + 1),
+    'glutSolidCube': lambda a: 24,
+    'glutSolidTeapot': lambda a: 32 * 2 * 8 * 8,
+}
+
+# ---------------------------
+# GL call counting
+# ---------------------------
+def _counting(fn, count_vertices):
+    def wrapper(*args, **kwargs):
+        global calls, vertices
+        calls += 1
+        if count_vertices is not None:
+            vertices += count_vertices(args)
+        return fn(*args, **kwargs)
+    wrapper.__wrapped__ = fn
+    return wrapper
+
+def instrument(namespace):
+    """Wrap every gl*/glu*/glut* function in namespace (a module's globals())."""
+    for name, fn in list(namespace.items()):
+        if not name.startswith('gl') or not callable(fn) or hasattr(fn, '__wrapped__'):
+            continue
+        if name.startswith('glVertex'):
+            count = lambda a: 1
+        else:
+            count = VERTEX_COUNTS.get(name)
+        namespace[name] = _counting(fn, count)
+
+def uninstrument(namespace):
+    for name, fn in list(namespace.items()):
+        if name.startswith('gl') and hasattr(fn, '__wrapped__'):
+            namespace[name] = fn.__wrapped__
+
+def count_list(mesh, before):
+    """Record the vertices a display list compiled since `before` submits."""
+    list_vertices[mesh] = vertices - before
+
+# ---------------------------
+# Stage timing
+# ---------------------------
+class _Stage:
+    __slots__ = ('name', 't0', 'calls0', 'vertices0')
+
+    def __init__(self, name):
+        self.name = name
+
+    def __enter__(self):
+        self.calls0 = calls
+        self.vertices0 = vertices
+        self.t0 = time.perf_counter()
+
+    def __exit__(self, *exc):
+        ms = (time.perf_counter() - self.t0) * 1000.0
+        sample = frame_samples.setdefault(self.name, [0.0, 0, 0])
+        sample[0] += ms
+        sample[1] += calls - self.calls0
+        sample[2] += vertices - self.vertices0
+
+class _NoStage:
+    __slots__ = ()
+
+    def __enter__(self):
+        pass
+
+    def __exit__(self, *exc):
+        pass
+
+_no_stage = _NoStage()
+
+def stage(name):
+    """Context manager timing one named stage of the current frame."""
+    return _Stage(name) if enabled else _no_stage
+
+def end_frame():
+    global frame_no
+    if not enabled:
+        return
+    if frame_samples:
+        history.append((frame_no, {name: tuple(s) for name, s in frame_samples.items()}))
+        frame_samples.clear()
+    frame_no += 1
+
+def reset():
+    history.clear()
+    frame_samples.clear()
+
+# ---------------------------
+# Reporting
+# ---------------------------
+def p99(times):
+    """Nearest-rank 99th percentile of a sorted list: at least 99% of it is <= this."""
+    return times[(99 * len(times) + 99) // 100 - 1]
+
+def summary():
+    """[(stage, avg_ms, p99_ms, avg_calls, avg_vertices)] over the window, slowest first."""
+    per_stage = {}
+    for _, samples in history:
+        for name, s in samples.items():
+            per_stage.setdefault(name, []).append(s)
+    rows = []
+    for name, samples in per_stage.items():
+        times = sorted(s[0] for s in samples)
+        n = len(samples)
+        rows.append((name,
+                     sum(times) / n,
+                     p99(times),
+                     sum(s[1] for s in samples) / n,
+                     sum(s[2] for s in samples) / n))
+    rows.sort(key=lambda r: r[1], reverse=True)
+    return rows
+
+def export_csv(path):
+    with open(path, 'w', newline='') as f:
+        writer = csv.writer(f)
+        writer.writerow(['frame', 'stage', 'ms', 'gl_calls', 'vertices'])
+        for frame, samples in history:
+            for name, (ms, n_calls, n_vertices) in samples.items():
+                writer.writerow([frame, name, f"{ms:.4f}", n_calls, n_vertices])
+    return path
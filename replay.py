@@ -0,0 +1,151 @@
+"""Deterministic input recording and max-speed replay.
+
+A recording stores the RNG seed, tick rate, grid size and start level, every
+change of the movement/jump keys (as a bitmask stamped with the tick it
+applies to), every player command, and a CRC32 of the game state after each tick.  It is
+gzip-compressed JSON.
+
+    python app.py --record session.sqrec    # play and record
+    python replay.py session.sqrec          # replay headless and verify
+
+Camera and theme keys only affect rendering and are not recorded.
+"""
+import array, base64, gzip, json, random, sys, time
+
+import sim
+
+FORMAT_VERSION = 6  # 2: enemies, 3: swept collisions, 4: waypoint platforms,
+                    # 5: box-limited flow field, 6: grid size
+KEY_BITS = {'a': 1, 'd': 2, 'w': 4, 's': 8}
+SPACE_BIT = 16
+
+class ReplayMismatch(Exception):
+    def __init__(self, tick, expected, actual):
+        super().__init__(f"state hash mismatch after tick {tick}: "
+                         f"recorded {expected:08x}, replayed {actual:08x}")
+        self.tick = tick
+
+def input_bits():
+    bits = SPACE_BIT if sim.state.space_pressed else 0
+    for key, bit in KEY_BITS.items():
+        if sim.state.move_keys[key]:
+            bits |= bit
+    return bits
+
+def apply_input_bits(bits):
+    for key, bit in KEY_BITS.items():
+        sim.state.move_keys[key] = bool(bits & bit)
+    sim.state.space_pressed = bool(bits & SPACE_BIT)
+
+# ---------------------------
+# Recording
+# ---------------------------
+class Recorder:
+    """Installed as sim.recorder; logs inputs, commands and state hashes."""
+
+    def __init__(self, seed, start_level):
+        self.seed = seed
+        self.start_level = start_level
+        self.events = []                  # [tick, "k", bits] / [tick, "c", name]
+        self.hashes = array.array('I')    # hashes[t] = state after tick t
+        self.last_bits = None
+
+    def on_tick(self):
+        t = sim.state.tick_count
+        if t > 0:
+            self.hashes.append(sim.state_hash())
+        bits = input_bits()
+        if bits != self.last_bits:
+            self.events.append([t, "k", bits])
+            self.last_bits = bits
+
+    def on_command(self, name):
+        self.events.append([sim.state.tick_count, "c", name])
+
+    def save(self, path):
+        hashes = array.array('I', self.hashes)
+        if sim.state.tick_count > 0:
+            hashes.append(sim.state_hash())
+        data = {
+            "version": FORMAT_VERSION,
+            "seed": self.seed,
+            "tick_rate": sim.tick_rate,
+            "grid_size_x": sim.grid_size_x,
+            "grid_size_y": sim.grid_size_y,
+            "start_level": self.start_level,
+            "ticks": sim.state.tick_count,
+            "events": self.events,
+            "hashes": base64.b64encode(hashes.tobytes()).decode(),
+        }
+        with gzip.open(path, 'wt') as f:
+            json.dump(data, f, separators=(',', ':'))
+
+def start_recording(seed=None, start_level=1):
+    """Start a fresh seeded run with a Recorder attached; returns the recorder."""
+    if seed is None:
+        seed = random.SystemRandom().randrange(2 ** 32)
+    sim.recorder = None
+    sim.start(seed=seed, start_level=start_level)
+    sim.recorder = Recorder(seed, start_level)
+    return sim.recorder
+
+# ---------------------------
+# Replay
+# ---------------------------
+def load(path):
+    with gzip.open(path, 'rt') as f:
+        data = json.load(f)
+    if data.get("version") != FORMAT_VERSION:
+        raise ValueError(f"{path}: recording format version {data.get('version')} is not "
+                         f"supported (this build reads version {FORMAT_VERSION} only); "
+                         f"record it again")
+    hashes = array.array('I')
+    hashes.frombytes(base64.b64decode(data["hashes"]))
+    data["hashes"] = hashes
+    return data
+
+def replay(data, check=True):
+    """Run a loaded recording through sim as fast as possible.
+
+    Raises ReplayMismatch at the first tick whose state differs from the
+    recording.  Returns the number of ticks replayed.
+    """
+    sim.recorder = None
+    sim.tick_rate = data["tick_rate"]
+    sim.configure_grid(data["grid_size_x"], data["grid_size_y"])
+    sim.start(seed=data["seed"], start_level=data["start_level"])
+    dt = 1.0 / data["tick_rate"]
+    events = data["events"]
+    hashes = data["hashes"]
+    ticks = data["ticks"]
+    e = 0
+    for t in range(ticks + 1):
+        # Commands stamped t happened before tick t's input was sampled
+        while e < len(events) and events[e][0] == t and events[e][1] == "c":
+            sim.command(events[e][2])
+            e += 1
+        if check and t > 0 and hashes[t - 1] != sim.state_hash():
+            raise ReplayMismatch(t - 1, hashes[t - 1], sim.state_hash())
+        if t == ticks:
+            break
+        if e < len(events) and events[e][0] == t and events[e][1] == "k":
+            apply_input_bits(events[e][2])
+            e += 1
+        sim.tick(dt)
+    return ticks
+
+def main():
+    if len(sys.argv) != 2:
+        sys.exit(f"usage: {sys.argv[0]} RECORDING")
+    data = load(sys.argv[1])
+    t0 = time.perf_counter()
+    try:
+        ticks = replay(data)
+    except ReplayMismatch as err:
+        sys.exit(f"FAIL: {err}")
+    elapsed = time.perf_counter() - t0
+    print(f"OK: {ticks} ticks ({ticks / data['tick_rate']:.1f} s of play) in {elapsed:.3f} s, "
+          f"{ticks / max(elapsed, 1e-9):.0f} ticks/s; score {sim.state.score}, level {sim.state.level}")
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,235 @@
+"""Rewind: a bounded in-memory history of the last few seconds of play.
+
+    sim.history = rewind.History(seconds=30)   # sim.tick() now calls on_tick()
+    ...
+    history.back(120)          # one second back at the default tick rate
+    history.seek(tick)         # or to an exact tick still in the buffer
+    history.losses()           # [(tick, cause)]: the last tick before each lost life
+
+Every tick is kept, so a death can be replayed from the exact tick before it
+and play resumes deterministically from wherever the history is left.
+
+A keyframe is a full sim.clone() plus the game's hot numbers (ball, timers,
+input, platforms, enemies, pickup mask) packed into one float64 vector.
+Other ticks store only the entries of that vector that differ from their
+keyframe, as one bytes object of values and uint16 indices.  A new keyframe
+is taken every keyframe_interval ticks, whenever something outside the
+vector changes (level, holes, lives, game state), and whenever a delta would
+hold more than max_delta_fraction of the vector (a crowd of moving enemies),
+since deltas against a fresh keyframe start small again.  Ticks live in a
+ring of seconds * tick_rate slots; keyframes are freed once no slot refers to
+them.  state.hole_edits tells set_hole() edits apart without comparing maps.
+"""
+import copy
+
+import numpy as np
+
+import sim
+
+# Packed scalars and the type each is restored as
+HOT_SCALARS = (
+    ("jumping", bool), ("jump_start_time", float), ("score", int), ("time_on_tile", float),
+    ("show_timer", bool), ("space_pressed", bool), ("speed_multiplier", float),
+    ("shield_active", bool), ("shield_time", float),
+    ("speed_boost_active", bool), ("speed_boost_timer", float),
+    ("slow_trap_active", bool), ("slow_trap_timer", float),
+    ("multiplier_active", bool), ("multiplier_timer", float), ("multiplier_factor", int),
+    ("goals_left", int), ("paused", bool), ("high_score", int), ("tick_count", int),
+)
+MOVE_KEYS = tuple(sim.state.move_keys)
+
+def pack():
+    """sim's hot state as one float64 vector (layout fixed within a keyframe)."""
+    s = sim.state
+    values = [getattr(s, name) for name, _ in HOT_SCALARS]
+    values.append(sim.clock.now())
+    values.extend(s.ball_pos)
+    values.extend(s.ball_vel)
+    values.extend(s.ball_color)
+    values.extend(s.move_keys[k] for k in MOVE_KEYS)
+    values.extend(s.last_tile or (-1, -1))
+    return np.concatenate((np.array(values, dtype=np.float64), s.platform_pos.ravel(),
+                           s.platform_along, s.platform_leg, s.enemy_pos.ravel(),
+                           s.pickup_active))
+
+def cold_key():
+    """What a delta cannot express; a change here starts a new keyframe."""
+    s = sim.state
+    return (s.level_version, s.holes_version, s.level, s.lives,
+            s.game_state, len(s.life_losses), len(s.enemy_pos), s.hole_edits)
+
+class Keyframe:
+    __slots__ = ("state", "vector", "cold")
+
+    def __init__(self, state, vector, cold):
+        self.state = state
+        self.vector = vector
+        self.cold = cold
+
+def unpack(key, vector):
+    """GameState of the keyframe with its hot values replaced by vector's."""
+    base = key.state
+    state = copy.copy(base)
+    for k, (name, kind) in enumerate(HOT_SCALARS):
+        setattr(state, name, kind(vector[k]))
+    v = vector[len(HOT_SCALARS):].tolist()
+    state.clock_time = v[0]
+    state.ball_pos = v[1:4]
+    state.ball_vel = v[4:7]
+    state.ball_color = v[7:10]
+    state.move_keys = {k: bool(on) for k, on in zip(MOVE_KEYS, v[10:14])}
+    state.last_tile = None if v[14] < 0 else (int(v[14]), int(v[15]))
+    at = len(HOT_SCALARS) + 16  # offset in vector rather than v
+    m = len(base.platform_along)
+    state.platform_pos = vector[at:at + 3 * m].reshape(-1, 3)
+    state.platform_along = vector[at + 3 * m:at + 4 * m]
+    state.platform_leg = vector[at + 4 * m:at + 5 * m].astype(np.int64)
+    at += 5 * m
+    n = 3 * key.cold[6]
+    state.enemy_pos = vector[at:at + n].reshape(-1, 3)
+    state.pickup_active = vector[at + n:].astype(bool)
+    # Render state: show the tick itself, not a blend with the one before
+    state.prev_ball_pos = list(state.ball_pos)
+    state.prev_enemy_pos = state.enemy_pos
+    state.prev_platform_pos = state.platform_pos
+    state.accumulator = 0.0
+    state.render_alpha = 1.0
+    return state
+
+class History:
+    """Ring buffer of the last `seconds` of ticks; install as sim.history."""
+
+    def __init__(self, seconds=30.0, keyframe_interval=120, max_delta_fraction=0.5):
+        self.capacity = max(1, int(round(seconds * sim.tick_rate)))
+        self.keyframe_interval = keyframe_interval
+        self.max_delta_fraction = max_delta_fraction
+        self.keys = [None] * self.capacity    # Keyframe of each slot
+        self.deltas = [None] * self.capacity  # bytes (values then indices), None at the keyframe
+        self.ticks = [0] * self.capacity      # tick_count after the tick
+        self.start = 0
+        self.count = 0
+        self.key = None
+        self.since_key = 0
+        self.loss_ticks = []                  # [(tick, cause)]
+
+    def __len__(self):
+        return self.count
+
+    def clear(self):
+        self.keys = [None] * self.capacity
+        self.deltas = [None] * self.capacity
+        self.start = self.count = 0
+        self.key = None
+        self.loss_ticks = []
+
+    # ---------------------------
+    # Capture
+    # ---------------------------
+    def on_tick(self):
+        vector = pack()
+        cold = cold_key()
+        key = self.key
+        changed = None
+        if (key is not None and cold == key.cold and self.since_key < self.keyframe_interval
+                and len(vector) == len(key.vector)):
+            changed = np.flatnonzero(vector != key.vector)
+            if len(changed) > self.max_delta_fraction * len(vector):
+                changed = None
+        if changed is None:
+            if key is not None and len(sim.state.life_losses) > key.cold[5] and self.count:
+                self.loss_ticks.append((self.ticks[self.newest()], sim.state.life_losses[-1]))
+            self.key = self.new_keyframe(vector, cold)
+            self.since_key = 0
+            delta = None
+        else:
+            self.since_key += 1
+            delta = vector[changed].tobytes() + changed.astype(self.index_type(key)).tobytes()
+
+        slot = (self.start + self.count) % self.capacity
+        if self.count == self.capacity:
+            self.start = (self.start + 1) % self.capacity
+        else:
+            self.count += 1
+        self.keys[slot] = self.key
+        self.deltas[slot] = delta
+        self.ticks[slot] = sim.state.tick_count
+
+    def new_keyframe(self, vector, cold):
+        state = sim.clone()
+        old = self.key
+        if old is not None and old.state.holes_version == state.holes_version \
+                and old.state.hole_edits == state.hole_edits:
+            # Share the per-tile arrays while the layout is unchanged
+            state.hole_map = old.state.hole_map
+            state.free_tiles = old.state.free_tiles
+            state.free_slot = old.state.free_slot
+        # unpack() rebuilds the enemies from the vector, which holds them already
+        state.enemy_pos = state.prev_enemy_pos = None
+        if old is not None and old.state.rng_state == state.rng_state:
+            state.rng_state = old.state.rng_state  # only level generation draws from it
+        return Keyframe(state, vector, cold)
+
+    @staticmethod
+    def index_type(key):
+        return np.uint16 if len(key.vector) <= 1 << 16 else np.uint32
+
+    # ---------------------------
+    # Rewinding
+    # ---------------------------
+    def newest(self):
+        return (self.start + self.count - 1) % self.capacity
+
+    def state_at(self, slot):
+        key = self.keys[slot]
+        delta = self.deltas[slot]
+        if delta is None:
+            return unpack(key, key.vector)
+        index_type = self.index_type(key)
+        n = len(delta) // (8 + np.dtype(index_type).itemsize)
+        vector = key.vector.copy()
+        vector[np.frombuffer(delta, index_type, n, 8 * n)] = np.frombuffer(delta, np.float64, n)
+        return unpack(key, vector)
+
+    def drop_after(self, keep):
+        """Forget all but the oldest `keep` (>= 1) ticks; captures continue from there."""
+        for k in range(keep, self.count):
+            slot = (self.start + k) % self.capacity
+            self.keys[slot] = self.deltas[slot] = None
+        self.count = keep
+        # The next capture must not delta against a keyframe from the dropped future
+        self.key = None
+        newest = self.ticks[self.newest()]
+        self.loss_ticks = [(t, cause) for t, cause in self.loss_ticks if t < newest]
+
+    def back(self, ticks=1):
+        """Restore the game `ticks` ticks before the newest one (stopping at the oldest).
+
+        The newer ticks are dropped.  Returns the restored tick, or None if
+        the history is empty.
+        """
+        if not self.count:
+            return None
+        keep = max(1, self.count - ticks)
+        self.drop_after(keep)
+        sim.restore(self.state_at(self.newest()))
+        return sim.state.tick_count
+
+    def seek(self, tick):
+        """Restore the most recent tick whose tick_count is `tick` and drop the ones after it."""
+        for k in range(self.count - 1, -1, -1):
+            if self.ticks[(self.start + k) % self.capacity] == tick:
+                return self.back(self.count - 1 - k)
+        raise ValueError(f"tick {tick} is not in the rewind history")
+
+    def losses(self):
+        """(tick, cause) of each life lost in the buffer; seek(tick) stands just before it."""
+        if not self.count:
+            return []
+        oldest = self.ticks[self.start]
+        return [(t, cause) for t, cause in self.loss_ticks if t >= oldest]
+
+    def nbytes(self):
+        """Approximate bytes held by deltas and keyframe vectors."""
+        keys = {id(k): k for k in self.keys if k is not None}
+        return (sum(len(d) for d in self.deltas if d is not None)
+                + sum(k.vector.nbytes for k in keys.values()))
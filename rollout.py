@@ -0,0 +1,139 @@
+"""Run many seeded headless games in parallel for balancing studies.
+
+    python rollout.py --episodes 10000 --policy scripted --out results.jsonl
+
+Episode k is sim.start(seed=SEED + k) driven by a policy until the game is
+lost, won, or --max-seconds of game time pass.  Episodes are spread over a
+process pool (each worker has its own copy of sim's globals) and one JSON
+line per episode is appended to --out as soon as it finishes:
+
+    {"episode": 7, "seed": 7, "score": 31, "level": 2, "lives_lost": 3,
+     "cause": "hole", "outcome": "game_over", "ticks": 5231, "seconds": 43.6}
+
+A policy is a factory called with the episode seed that returns a function
+run before every tick; that function steers with sim.set_input().  Use a
+built-in name from POLICIES or "package.module:factory" for your own.
+"""
+import argparse, importlib, json, multiprocessing, os, random, sys, time
+
+import numpy as np
+
+import sim
+
+# ---------------------------
+# Policies
+# ---------------------------
+def random_policy(seed):
+    """Hold a random key combination for 0.1-1 s at a time, sometimes jumping."""
+    rng = random.Random(seed)
+    next_change = [0.0]
+
+    def step():
+        if sim.clock.now() >= next_change[0]:
+            sim.set_input(keys=rng.choice(["", "w", "a", "s", "d", "wa", "wd", "sa", "sd"]),
+                          space=rng.random() < 0.2)
+            next_change[0] = sim.clock.now() + rng.uniform(0.1, 1.0)
+    return step
+
+def scripted_policy(seed):
+    """Head for the nearest collectible or star; jump when a hole or obstacle is ahead."""
+    def step():
+        s = sim.state
+        goals = np.flatnonzero(s.pickup_active & (s.pickup_kind >= sim.PICKUP_COLLECTIBLE))
+        if not len(goals):
+            sim.set_input(keys="", space=False)
+            return
+        x, y = s.ball_pos[0], s.ball_pos[1]
+        d = s.pickup_pos[goals, :2] - (x, y)
+        dx, dy = d[np.argmin(np.einsum('ij,ij->i', d, d))]
+        keys = ("d" if dx > 5 else "a" if dx < -5 else "") + ("w" if dy > 5 else "s" if dy < -5 else "")
+
+        # Look one tile ahead along the direction of travel
+        ahead_x = x + np.sign(dx) * sim.tile_size * ("a" in keys or "d" in keys)
+        ahead_y = y + np.sign(dy) * sim.tile_size * ("w" in keys or "s" in keys)
+        i, j = sim.tile_of(ahead_x, ahead_y)
+        danger = 0 <= i < sim.grid_size_x and 0 <= j < sim.grid_size_y and s.hole_map[i, j]
+        for k in sim.nearby(s.tile_obstacles, ahead_x, ahead_y):
+            ox, oy, _ = s.obstacle_pos[k]
+            reach = s.obstacle_size[k] + sim.tile_size / 2
+            if abs(ox - ahead_x) < reach and abs(oy - ahead_y) < reach:
+                danger = True
+        sim.set_input(keys=keys, space=bool(danger))
+    return step
+
+POLICIES = {
+    "random": random_policy,
+    "scripted": scripted_policy,
+}
+
+def resolve_policy(name):
+    if name in POLICIES:
+        return POLICIES[name]
+    module, sep, attr = name.partition(":")
+    if not sep:
+        raise ValueError(f"unknown policy {name!r}: use one of {sorted(POLICIES)} or module:factory")
+    return getattr(importlib.import_module(module), attr)
+
+# ---------------------------
+# Episodes
+# ---------------------------
+def init_worker(grid):
+    if grid:
+        sim.configure_grid(*grid)
+
+def run_episode(task):
+    episode, seed, policy_name, start_level, max_seconds, dt = task
+    factory = resolve_policy(policy_name)
+    sim.recorder = None
+    sim.start(seed=seed, start_level=start_level)
+    ticks = sim.fast_forward(max_seconds, dt, factory(seed))
+    outcome = "timeout" if sim.state.game_state == "playing" else sim.state.game_state
+    return {
+        "episode": episode,
+        "seed": seed,
+        "policy": policy_name,
+        "score": sim.state.score,
+        "level": sim.state.level,
+        "lives_lost": len(sim.state.life_losses),
+        "cause": sim.state.life_losses[-1] if outcome == "game_over" else None,
+        "outcome": outcome,
+        "ticks": ticks,
+        "seconds": round(ticks * dt, 4),
+    }
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.split("\n\n")[0])
+    parser.add_argument("--episodes", type=int, default=1000)
+    parser.add_argument("--policy", default="random", help=f"{', '.join(POLICIES)} or module:factory")
+    parser.add_argument("--seed", type=int, default=0, help="seed of episode 0; episode k uses SEED + k")
+    parser.add_argument("--start-level", type=int, default=1)
+    parser.add_argument("--max-seconds", type=float, default=600.0, help="game time before an episode times out")
+    parser.add_argument("--dt", type=float, default=1.0 / sim.tick_rate, help="seconds per tick")
+    parser.add_argument("--grid", metavar="WxH", help="tile grid size (default 30x20)")
+    parser.add_argument("--workers", type=int, default=os.cpu_count(), help="worker processes")
+    parser.add_argument("--out", default="rollouts.jsonl", help="results file (JSON lines)")
+    args = parser.parse_args()
+    try:
+        resolve_policy(args.policy)  # fail here rather than in every worker
+    except (ValueError, ImportError, AttributeError) as err:
+        parser.error(str(err))
+    grid = tuple(int(v) for v in args.grid.lower().split("x")) if args.grid else None
+
+    tasks = [(k, args.seed + k, args.policy, args.start_level, args.max_seconds, args.dt)
+             for k in range(args.episodes)]
+    chunksize = max(1, min(64, args.episodes // (args.workers * 8)))
+    scores = []
+    t0 = time.perf_counter()
+    with open(args.out, "w") as out, \
+         multiprocessing.Pool(args.workers, init_worker, (grid,)) as pool:
+        for result in pool.imap_unordered(run_episode, tasks, chunksize):
+            out.write(json.dumps(result) + "\n")
+            out.flush()
+            scores.append(result["score"])
+    elapsed = time.perf_counter() - t0
+    print(f"{len(scores)} episodes in {elapsed:.1f} s ({len(scores) / max(elapsed, 1e-9):.1f}/s) "
+          f"on {args.workers} workers; mean score {sum(scores) / max(len(scores), 1):.2f}; "
+          f"results in {args.out}", file=sys.stderr)
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,1176 @@
+"""Headless Sphere Quest simulation.
+
+Holds the game rules with no OpenGL import, so the game can be stepped
+without a window and faster than real time.  The running game is one
+GameState, `state`; `app.py` renders it and feeds keyboard input into
+`state.move_keys` / `state.space_pressed`.
+"""
+import math, random, struct, zlib
+
+import numpy as np
+
+# ---------------------------
+# Virtual clock
+# ---------------------------
+class VirtualClock:
+    """Simulation time, advanced only by update(dt)."""
+
+    def __init__(self, start=0.0):
+        self.t = start
+
+    def now(self):
+        return self.t
+
+    def advance(self, dt):
+        self.t += dt
+
+    def set(self, t):
+        self.t = t
+
+clock = VirtualClock()
+
+def set_clock(new_clock):
+    """Swap in another clock (anything with now(), advance(dt) and set(t))."""
+    global clock
+    clock = new_clock
+
+# ---------------------------
+# Game physics
+# ---------------------------
+gravity = -500.0
+jump_strength = 250.0
+max_jump_duration = 0.35
+ball_radius = 15.0
+max_tile_time = 5
+
+# ---------------------------
+# Grid settings
+# ---------------------------
+grid_size_x = 30
+grid_size_y = 20
+tile_size = 60
+half_size_x = grid_size_x * tile_size / 2
+half_size_y = grid_size_y * tile_size / 2
+
+def configure_grid(size_x, size_y):
+    """Resize the tile grid; takes effect at the next start() / reset_game()."""
+    global grid_size_x, grid_size_y, half_size_x, half_size_y
+    grid_size_x, grid_size_y = size_x, size_y
+    half_size_x = grid_size_x * tile_size / 2
+    half_size_y = grid_size_y * tile_size / 2
+    state.hole_map = np.zeros((grid_size_x, grid_size_y), dtype=bool)
+
+hole_changes = []   # tiles flipped by set_hole() since the renderer last looked
+
+# ---------------------------
+# Pickups
+# ---------------------------
+# Every collectable entity (power-ups, collectibles, stars) is one row of the
+# state's pickup arrays, so update() can test them all with a single batched
+# distance check.  pickup_value is a power-up's duration in seconds (for a
+# time bonus, the seconds it takes off the tile timer); collectibles also
+# have a pickup_shape (index into COLLECTIBLE_SHAPES) and a pickup_color.
+PICKUP_SPEED_BOOST, PICKUP_SLOW_TRAP, PICKUP_TIME_BONUS, PICKUP_LIFE, \
+    PICKUP_MULTIPLIER, PICKUP_SHIELD, PICKUP_COLLECTIBLE, PICKUP_SPECIAL = range(8)
+PICKUP_RADIUS = (10, 10, 10, 10, 10, 15, 15, 15)  # by kind
+COLLECTIBLE_SHAPES = ('cube', 'torus', 'pyramid', 'sphere', 'teapot')
+multiplier_bonus = 2  # score factor while a multiplier runs
+
+# Power-ups are the same on every level: (kind, position, value), in row order
+power_ups = (
+    (PICKUP_SPEED_BOOST, (150, 150, 15), 5.0),
+    (PICKUP_SPEED_BOOST, (-150, -150, 15), 5.0),
+    (PICKUP_SLOW_TRAP, (150, -150, 15), 3.0),
+    (PICKUP_SLOW_TRAP, (-150, 150, 15), 3.0),
+    (PICKUP_TIME_BONUS, (250, 250, 15), 3.0),
+    (PICKUP_TIME_BONUS, (-250, -250, 15), 3.0),
+    (PICKUP_LIFE, (300, 0, 15), 0.0),
+    (PICKUP_LIFE, (-300, 0, 15), 0.0),
+    (PICKUP_MULTIPLIER, (0, 300, 15), 10.0),
+    (PICKUP_SHIELD, (200, 200, 15), 10.0),
+    (PICKUP_SHIELD, (-200, -200, 15), 10.0),
+)
+
+# ---------------------------
+# Obstacles, teleporters
+# ---------------------------
+OBSTACLE_SHAPES = ('sphere', 'cube', 'cone')
+teleporters = (  # (pad centre, target)
+    ((300, 300, 15), (-300, -300, 15)),
+    ((-300, 300, 15), (300, -300, 15)),
+)
+
+# ---------------------------
+# Moving platforms
+# ---------------------------
+# Each platform glides at a constant speed around a closed loop of (x, y)
+# waypoints, the last leading back to the first; a single waypoint keeps it
+# still.  A level's platforms are level_platforms[level] (default_platforms
+# when absent), loaded by reset_game() into arrays so advance_platforms()
+# moves all of them in one vectorised step.  state.platform_layout holds
+# what a level fixes (see build_platform_layout()); platform_leg[k] is the
+# row of layout['points'] platform k last passed and platform_along[k] how
+# far past it the platform is.
+default_platforms = [
+    {'path': [(0, 0), (250, 0), (-250, 0)], 'z': 25, 'size': (80, 30, 8), 'speed': 60},
+    {'path': [(150, -150), (150, 200), (150, -200)], 'z': 30, 'size': (50, 50, 8), 'speed': 60},
+]
+level_platforms = {}  # level -> list of platforms like default_platforms
+
+# ---------------------------
+# Enemies
+# ---------------------------
+# Enemies chase the ball across the tile grid, around holes and tiles with
+# an obstacle on them.  They all steer by one flow field: a BFS from the
+# ball's tile, rebuilt only when the ball enters another tile or the layout
+# changes, so a rebuild costs the same however many enemies there are.  The
+# field covers the box of tiles within flow_radius (Chebyshev) of the ball,
+# which is the whole 30x20 grid; on large grids a rebuild stays a few
+# thousand tiles and enemies outside the box head straight for the ball.
+# flow_box is (i0, i1, j0, j1); tile (i, j) of the box is row
+# (i - i0) * (j1 - j0) + j - j0 of flow_next, which holds the id
+# (i * grid_size_y + j) of the neighbour one step closer to the ball, the
+# tile's own id on the ball's tile and -1 if unreachable within the box.
+enemies_per_level = 2      # per level after the first, scaled to a 30x20 grid
+enemy_radius = 12.0
+enemy_speed = 60.0         # plus enemy_level_speed per level; the ball does 220+
+enemy_level_speed = 10.0
+enemy_spawn_distance = 5   # min tiles (Chebyshev) from the ball when placed
+max_enemies = 200          # cap on the area scaling, for very large grids
+flow_radius = 40
+
+# ---------------------------
+# Level progression
+# ---------------------------
+max_level = 10
+
+# ---------------------------
+# Game state
+# ---------------------------
+# Everything a tick can change is a slot of one GameState, `state`, so the
+# hot loop reads slots instead of module globals and a snapshot is one
+# copy.  Entities are rows of typed arrays: pickups (pickup_*), obstacles
+# (obstacle_*), platforms and enemies.  Level layouts (pickup positions and
+# looks, obstacles and their tile buckets, flow fields, platform paths) are
+# replaced, never edited, once a level is generated, so copies share them
+# along with the scalars; SNAPSHOT_COPIED is what changes in place.
+SNAPSHOT_SHARED = (
+    "jumping", "jump_start_time", "score", "lives", "game_over", "game_won", "last_tile",
+    "time_on_tile", "show_timer", "space_pressed", "difficulty_timer", "difficulty_mode",
+    "level_version", "holes_version", "hole_edits", "free_count", "speed_multiplier",
+    "shield_active", "shield_time", "speed_boost_active", "speed_boost_timer",
+    "slow_trap_active", "slow_trap_timer", "multiplier_active", "multiplier_timer",
+    "multiplier_factor", "pickup_pos", "pickup_radius", "pickup_kind", "pickup_value",
+    "pickup_shape", "pickup_color", "goals_left", "obstacle_pos", "obstacle_size",
+    "obstacle_shape", "obstacle_color", "tile_obstacles", "flow_dist", "flow_next",
+    "flow_tile", "flow_box", "level", "paused", "high_score", "game_state", "accumulator",
+    "render_alpha", "platform_layout", "tick_count",
+)
+SNAPSHOT_COPIED = (
+    "ball_pos", "ball_vel", "ball_color", "move_keys", "life_losses", "hole_map",
+    "pickup_active", "free_tiles", "free_slot", "enemy_pos", "prev_ball_pos", "prev_enemy_pos",
+    "platform_pos", "platform_leg", "platform_along", "prev_platform_pos",
+)
+
+class GameState:
+    """The running game (sim.state), or a copy of it from clone()."""
+    __slots__ = SNAPSHOT_SHARED + SNAPSHOT_COPIED + ("clock_time", "rng_state")
+
+    def __init__(self):
+        # Ball
+        self.ball_pos = [0.0, 0.0, ball_radius]
+        self.ball_vel = [0.0, 0.0, 0.0]
+        self.ball_color = [1.0, 0.2, 0.2]  # Default red
+        self.jumping = False
+        self.jump_start_time = 0.0
+
+        # Run
+        self.score = 0
+        self.lives = 3
+        self.level = 1
+        self.high_score = 0
+        self.game_over = False
+        self.game_won = False
+        self.game_state = "menu"  # "menu", "playing", "paused", "game_over", "win", "help"
+        self.paused = False
+        self.life_losses = []  # cause of each life lost this run: "obstacle", "enemy", "hole" or "tile_timer"
+        self.tick_count = 0
+        self.move_keys = {"a": False, "d": False, "w": False, "s": False}
+        self.space_pressed = False
+        self.last_tile = None
+        self.time_on_tile = 0.0
+        self.show_timer = False
+        self.difficulty_timer = None
+        self.difficulty_mode = False
+
+        # Power-up effects
+        self.speed_multiplier = 1.0
+        self.speed_boost_active = False
+        self.speed_boost_timer = 0.0
+        self.slow_trap_active = False
+        self.slow_trap_timer = 0.0
+        self.multiplier_active = False
+        self.multiplier_timer = 0.0
+        self.multiplier_factor = 1
+        self.shield_active = False
+        self.shield_time = 0
+
+        # Holes.  The free-tile pool holds the ids (i * grid_size_y + j) of
+        # tiles that are neither holes nor claimed by a collectible or star:
+        # free_tiles[:free_count] is the pool and free_slot[id] the id's
+        # position in it (-1 when absent), so drawing, claiming and releasing
+        # a tile are all O(1).
+        self.hole_map = np.zeros((grid_size_x, grid_size_y), dtype=bool)  # hole_map[i, j]: tile is a hole
+        self.holes_version = 0  # bumped whenever the hole layout is regenerated
+        self.hole_edits = 0     # bumped by every set_hole(); with holes_version, names the hole map
+        self.free_tiles = np.zeros(0, dtype=np.int32)
+        self.free_slot = np.zeros(0, dtype=np.int32)
+        self.free_count = 0
+
+        # Level layout
+        self.level_version = 0  # bumped whenever pickups / obstacles are regenerated
+        self.pickup_pos = np.zeros((0, 3))
+        self.pickup_radius = np.zeros(0)
+        self.pickup_active = np.zeros(0, dtype=bool)
+        self.pickup_kind = np.zeros(0, dtype=np.int8)
+        self.pickup_value = np.zeros(0)
+        self.pickup_shape = np.zeros(0, dtype=np.int8)
+        self.pickup_color = np.zeros((0, 3))
+        self.goals_left = 0  # active collectibles + special points
+        self.obstacle_pos = np.zeros((0, 3))
+        self.obstacle_size = np.zeros(0)
+        self.obstacle_shape = np.zeros(0, dtype=np.int8)  # index into OBSTACLE_SHAPES
+        self.obstacle_color = np.zeros((0, 3))
+        self.tile_obstacles = {}  # tile (i, j) -> obstacle rows centred on it
+
+        # Platforms
+        self.platform_layout = None
+        self.platform_pos = np.zeros((0, 3))  # box centres
+        self.platform_leg = np.zeros(0, dtype=np.int64)
+        self.platform_along = np.zeros(0)
+
+        # Enemies
+        self.enemy_pos = np.zeros((0, 3))
+        self.flow_box = (0, 0, 0, 0)
+        self.flow_dist = np.full((0, 0), -1, dtype=np.int32)  # BFS steps over flow_box, -1 unreachable
+        self.flow_next = np.full(0, -1, dtype=np.int32)
+        self.flow_tile = None  # ball tile the field was built from; None when stale
+
+        # Fixed timestep and the previous tick, for interpolation
+        self.accumulator = 0.0
+        self.render_alpha = 1.0
+        self.prev_ball_pos = list(self.ball_pos)
+        self.prev_platform_pos = self.platform_pos.copy()
+        self.prev_enemy_pos = self.enemy_pos.copy()
+
+        # Set only on snapshots (see clone())
+        self.clock_time = None
+        self.rng_state = None
+
+    def copy(self):
+        """A copy in O(size of the mutable state)."""
+        other = GameState.__new__(GameState)
+        other.assign(self)
+        other.clock_time = self.clock_time
+        other.rng_state = self.rng_state
+        return other
+
+    def assign(self, other):
+        """Take other's values, copying what changes in place and sharing the rest."""
+        for name in SNAPSHOT_SHARED:
+            setattr(self, name, getattr(other, name))
+        for name in SNAPSHOT_COPIED:
+            setattr(self, name, getattr(other, name).copy())
+
+state = GameState()
+
+# ---------------------------
+# Spatial hash
+# ---------------------------
+# Tile (i, j) -> entities centred on that tile.  Every obstacle and pickup
+# reach is under one tile_size, so the ball only needs its own tile and the
+# eight around it.  tile_pickups (active pickup rows) follows
+# state.pickup_active and is rebuilt on restore(); obstacles are bucketed in
+# state.tile_obstacles.
+tile_pickups = {}
+
+# ---------------------------
+# Helpers
+# ---------------------------
+def generate_holes():
+    s = state
+    s.holes_version += 1
+    hole_changes.clear()
+    # Don't place holes near the starting position
+    allowed = np.ones((grid_size_x, grid_size_y), dtype=bool)
+    ci, cj = grid_size_x // 2, grid_size_y // 2
+    allowed[max(0, ci - 3):ci + 4, max(0, cj - 3):cj + 4] = False
+    allowed = np.flatnonzero(allowed)
+    # Same hole density as the original 30x20 grid on any grid size
+    num_holes = min(30 + s.level * 3, 150) * grid_size_x * grid_size_y // 600
+    num_holes = min(num_holes, len(allowed))
+    s.hole_map = np.zeros((grid_size_x, grid_size_y), dtype=bool)
+    s.hole_map.flat[allowed[random.sample(range(len(allowed)), num_holes)]] = True
+    build_free_tiles()
+
+def build_free_tiles():
+    """Put every non-hole tile back in the free pool."""
+    s = state
+    n = grid_size_x * grid_size_y
+    free = np.flatnonzero(~s.hole_map).astype(np.int32)
+    s.free_count = len(free)
+    s.free_tiles = np.zeros(n, dtype=np.int32)
+    s.free_tiles[:s.free_count] = free
+    s.free_slot = np.full(n, -1, dtype=np.int32)
+    s.free_slot[free] = np.arange(s.free_count, dtype=np.int32)
+
+def claim_tile(k):
+    """Remove tile id k from the free pool (swap with the last entry)."""
+    s = state
+    slot = s.free_slot[k]
+    if slot < 0:
+        return
+    s.free_count -= 1
+    last = s.free_tiles[s.free_count]
+    s.free_tiles[slot] = last
+    s.free_slot[last] = slot
+    s.free_slot[k] = -1
+
+def release_tile(k):
+    s = state
+    if s.free_slot[k] >= 0:
+        return
+    s.free_tiles[s.free_count] = k
+    s.free_slot[k] = s.free_count
+    s.free_count += 1
+
+def set_hole(i, j, is_hole):
+    """Open or close a single hole after the level was generated."""
+    s = state
+    if is_hole == s.hole_map[i, j]:
+        return
+    s.flow_tile = None  # enemies must re-route
+    s.hole_edits += 1
+    s.hole_map[i, j] = is_hole
+    if is_hole:
+        claim_tile(i * grid_size_y + j)
+    else:
+        release_tile(i * grid_size_y + j)
+    hole_changes.append((i, j))
+
+def find_safe_tile():
+    """Claim a random free tile and return its centre.
+
+    Each call gets a different tile until the pool runs dry; then every
+    non-hole tile becomes available again and items start sharing tiles.
+    """
+    s = state
+    if s.free_count == 0:
+        build_free_tiles()
+        if s.free_count == 0:
+            raise RuntimeError("no free tiles: every tile is a hole")
+    k = int(s.free_tiles[random.randrange(s.free_count)])
+    claim_tile(k)
+    i, j = divmod(k, grid_size_y)
+    x = i * tile_size - half_size_x + tile_size / 2
+    y = j * tile_size - half_size_y + tile_size / 2
+    return (x, y)
+
+def find_safe_start_tile():
+    # Find a safe tile near the center
+    hole_map = state.hole_map
+    center_i = grid_size_x // 2
+    center_j = grid_size_y // 2
+    for radius in range(0, max(grid_size_x, grid_size_y)):
+        for i in range(center_i - radius, center_i + radius + 1):
+            for j in range(center_j - radius, center_j + radius + 1):
+                if 0 <= i < grid_size_x and 0 <= j < grid_size_y and not hole_map[i, j]:
+                    x = i * tile_size - half_size_x + tile_size / 2
+                    y = j * tile_size - half_size_y + tile_size / 2
+                    return [x, y, ball_radius]
+    return [0.0, 0.0, ball_radius]
+
+def reset_game(reset_score=True, reset_lives=True):
+    s = state
+    if s.score > s.high_score:
+        s.high_score = s.score
+
+    s.ball_pos[:] = find_safe_start_tile()
+    s.ball_vel[:] = [0.0, 0.0, 0.0]
+    s.jumping = False
+    s.jump_start_time = 0.0
+
+    if reset_score:
+        s.score = 0
+        generate_holes()
+        # Collectibles then special points, each on its own free tile
+        collectibles = []
+        for _ in range(15 + s.level * 2):
+            x, y = find_safe_tile()
+            shape = random.randrange(len(COLLECTIBLE_SHAPES))
+            collectibles.append((x, y, shape, random.random(), random.random(), random.random()))
+        specials = [find_safe_tile() for _ in range(5 + s.level)]
+        build_pickups(collectibles, specials)
+
+        s.speed_boost_active = False
+        s.speed_boost_timer = 0.0
+        s.slow_trap_active = False
+        s.slow_trap_timer = 0.0
+        s.multiplier_active = False
+        s.multiplier_timer = 0.0
+        s.multiplier_factor = 1
+        s.ball_color = [1.0, 0.2, 0.2]
+        s.shield_active = False
+        s.shield_time = 0
+
+        # Generate obstacles
+        n = min(5 + s.level * 2, 20)
+        s.obstacle_pos = np.empty((n, 3))
+        s.obstacle_size = np.empty(n)
+        s.obstacle_shape = np.empty(n, dtype=np.int8)
+        s.obstacle_color = np.empty((n, 3))
+        for k in range(n):
+            x = random.uniform(-half_size_x + 50, half_size_x - 50)
+            y = random.uniform(-half_size_y + 50, half_size_y - 50)
+            s.obstacle_pos[k] = (x, y, 30)
+            s.obstacle_size[k] = random.uniform(15, 30)
+            s.obstacle_shape[k] = random.randrange(len(OBSTACLE_SHAPES))
+            s.obstacle_color[k] = (random.random() * 0.5 + 0.5, random.random() * 0.3, random.random() * 0.3)
+
+        build_spatial_hash()
+        load_platforms(level_platforms.get(s.level, default_platforms))
+        s.level_version += 1
+
+    spawn_enemies()
+
+    if reset_lives:
+        s.lives = 3
+        s.life_losses.clear()
+
+    s.game_over = False
+    s.game_won = False
+    s.last_tile = None
+    s.time_on_tile = 0.0
+    s.show_timer = False
+
+    s.difficulty_timer = None
+    s.difficulty_mode = False
+    s.speed_multiplier = 1.0 + s.level * 0.1
+
+    s.game_state = "playing"
+
+def build_pickups(collectibles, specials):
+    """Lay out the pickup rows: power_ups, then collectibles (x, y, shape,
+    r, g, b), then special points (x, y); all start active."""
+    s = state
+    p, c = len(power_ups), len(collectibles)
+    n = p + c + len(specials)
+    s.pickup_kind = np.array([kind for kind, _, _ in power_ups]
+                             + [PICKUP_COLLECTIBLE] * c + [PICKUP_SPECIAL] * len(specials), dtype=np.int8)
+    s.pickup_pos = np.full((n, 3), 15.0)
+    s.pickup_pos[:p] = [pos for _, pos, _ in power_ups]
+    s.pickup_pos[p:p + c, :2] = [item[:2] for item in collectibles]
+    s.pickup_pos[p + c:, :2] = specials
+    s.pickup_radius = np.array(PICKUP_RADIUS, dtype=np.float64)[s.pickup_kind]
+    s.pickup_value = np.zeros(n)
+    s.pickup_value[:p] = [value for _, _, value in power_ups]
+    s.pickup_shape = np.full(n, -1, dtype=np.int8)
+    s.pickup_shape[p:p + c] = [item[2] for item in collectibles]
+    s.pickup_color = np.zeros((n, 3))
+    s.pickup_color[p:p + c] = [item[3:] for item in collectibles]
+    s.pickup_active = np.ones(n, dtype=bool)
+    s.goals_left = n - p
+
+def tile_of(x, y):
+    return (int((x + half_size_x) // tile_size), int((y + half_size_y) // tile_size))
+
+def build_spatial_hash():
+    """Bucket active pickups and all obstacles by the tile they sit on."""
+    build_pickup_hash()
+    tiles = {}
+    for k, (x, y) in enumerate(state.obstacle_pos[:, :2].tolist()):
+        tiles.setdefault(tile_of(x, y), []).append(k)
+    state.tile_obstacles = tiles
+
+def build_pickup_hash():
+    global tile_pickups
+    s = state
+    tile_pickups = {}
+    rows = np.flatnonzero(s.pickup_active)
+    i = ((s.pickup_pos[rows, 0] + half_size_x) // tile_size).astype(int).tolist()
+    j = ((s.pickup_pos[rows, 1] + half_size_y) // tile_size).astype(int).tolist()
+    for row, tile in zip(rows.tolist(), zip(i, j)):
+        tile_pickups.setdefault(tile, []).append(row)
+
+def nearby(buckets, x, y, x1=None, y1=None, margin=1):
+    """Entries of buckets on the tiles containing (x, y), or the box from
+    (x, y) to (x1, y1), and the margin tiles around them."""
+    i0, j0 = tile_of(x, y)
+    i1, j1 = (i0, j0) if x1 is None else tile_of(x1, y1)
+    i0, i1 = min(i0, i1), max(i0, i1)
+    j0, j1 = min(j0, j1), max(j0, j1)
+    found = []
+    for i in range(i0 - margin, i1 + margin + 1):
+        for j in range(j0 - margin, j1 + margin + 1):
+            bucket = buckets.get((i, j))
+            if bucket:
+                found.extend(bucket)
+    return found
+
+def sweep_hit(start, move, centre, reach):
+    """Whether the segment from start to start + move comes within reach of centre.
+
+    Testing the closest point of the whole segment rather than where the ball
+    ends up means a large dt cannot step over a small obstacle or pickup.
+    Plain floats for the few entities near the ball; the arithmetic matches
+    sweep_hits() step for step so sim and VecEnv agree bit for bit.
+    """
+    fx = centre[0] - start[0]
+    fy = centre[1] - start[1]
+    fz = centre[2] - start[2]
+    ux, uy, uz = move
+    length2 = ux * ux + uy * uy + uz * uz
+    t = min(max((fx * ux + fy * uy + fz * uz) / (length2 if length2 > 0 else 1.0), 0.0), 1.0)
+    dx, dy, dz = fx - ux * t, fy - uy * t, fz - uz * t
+    return math.sqrt(dx * dx + dy * dy + dz * dz) < reach
+
+def sweep_hits(start, move, centres, reach):
+    """sweep_hit() for arrays: mask of the spheres (centres (..., 3), radii
+    reach) near the segment.  start and move broadcast against centres."""
+    fx = centres[..., 0] - start[..., 0]
+    fy = centres[..., 1] - start[..., 1]
+    fz = centres[..., 2] - start[..., 2]
+    ux, uy, uz = move[..., 0], move[..., 1], move[..., 2]
+    length2 = ux * ux + uy * uy + uz * uz
+    t = np.minimum(np.maximum((fx * ux + fy * uy + fz * uz) / np.where(length2 > 0, length2, 1.0), 0.0), 1.0)
+    dx, dy, dz = fx - ux * t, fy - uy * t, fz - uz * t
+    return np.sqrt(dx * dx + dy * dy + dz * dz) < reach
+
+def lands_on(start, end, pos, size, old_x, old_y):
+    """Whether the ball moving start -> end comes down onto the top of the
+    platform at pos (size (sx, sy, sz)) this tick.
+
+    Besides ending inside the platform's box from above, a ball that crosses
+    the top face while over it lands, however far it fell in one tick.  The
+    crossing is found in the platform's frame (it moved from old_x, old_y).
+    """
+    px, py, pz = pos
+    sx, sy, sz = size
+    if (abs(end[0] - px) < sx / 2 + ball_radius and
+        abs(end[1] - py) < sy / 2 + ball_radius and
+        abs(end[2] - pz) < sz / 2 + ball_radius and
+        end[2] > pz):
+        return True
+    top = pz + sz / 2 + ball_radius
+    if not start[2] >= top > end[2]:
+        return False
+    f = (start[2] - top) / (start[2] - end[2])
+    rx = (start[0] - old_x) + f * ((end[0] - px) - (start[0] - old_x))
+    ry = (start[1] - old_y) + f * ((end[1] - py) - (start[1] - old_y))
+    return abs(rx) < sx / 2 + ball_radius and abs(ry) < sy / 2 + ball_radius
+
+def build_platform_layout(platforms):
+    """The arrays a level fixes for platforms (dicts like default_platforms).
+
+    Every waypoint of every platform is one row of 'points', and row g's leg
+    runs to row 'next'[g] along unit vector 'heading'[g] for 'length'[g]
+    (inf for a still platform).  Per platform: 'first' waypoint row, 'start'
+    centre, 'size', 'speed' and 'loop' length; 'lowest' is the lowest centre
+    height.  'tiles' files each platform under every tile its route passes
+    close enough to hold the ball up on, so the support query reads only the
+    ball's own tiles and nothing is re-filed as platforms move.  VecEnv
+    builds the same layout for its games.
+    """
+    points, nexts, owner, first, start, size, speed = [], [], [], [], [], [], []
+    for k, platform in enumerate(platforms):
+        path = [tuple(p) for p in platform['path']]
+        # Repeated waypoints would make legs of length zero
+        path = [p for n, p in enumerate(path) if n == 0 or p != path[n - 1]]
+        if len(path) > 1 and path[-1] == path[0]:
+            path.pop()
+        first.append(len(points))
+        nexts.extend(range(len(points) + 1, len(points) + len(path)))
+        nexts.append(len(points))
+        owner.extend([k] * len(path))
+        points.extend(path)
+        start.append((path[0][0], path[0][1], platform['z']))
+        size.append(platform['size'])
+        speed.append(platform['speed'] if len(path) > 1 else 0.0)
+    points = np.array(points, dtype=np.float64).reshape(-1, 2)
+    nexts = np.array(nexts, dtype=np.int64)
+    owner = np.array(owner, dtype=np.int64)
+    delta = points[nexts] - points
+    length = np.hypot(delta[:, 0], delta[:, 1])
+    length[length == 0] = np.inf  # a single waypoint's leg back to itself
+    first = np.array(first, dtype=np.int64)
+    size = np.array(size, dtype=np.float64).reshape(-1, 3)
+    speed = np.array(speed, dtype=np.float64)
+
+    # Sample every leg at most half a tile apart.  The ball can be held up
+    # within reach of a platform's centre (per axis), which is within a
+    # quarter tile of a sample; the rest of the margin covers a tick's
+    # chord across a waypoint.
+    step = tile_size / 2
+    count = np.ceil(np.where(np.isfinite(length), length, 0.0) / step).astype(np.int64) + 1
+    leg = np.repeat(np.arange(len(points)), count)
+    f = (np.arange(len(leg)) - np.repeat(np.cumsum(count) - count, count)) / np.repeat(np.maximum(count - 1, 1), count)
+    sample_tile = ((points[leg] + delta[leg] * f[:, None] + (half_size_x, half_size_y)) // tile_size).astype(np.int64)
+    reach = size[owner[leg], :2].max(axis=1) / 2 + ball_radius
+    margin = np.ceil((reach + step) / tile_size).astype(np.int64)
+    n = max(len(size), 1)
+    keys = [np.zeros(0, dtype=np.int64)]  # tile id * n + platform
+    for m in np.unique(margin).tolist():
+        at = np.flatnonzero(margin == m)
+        around = np.arange(-m, m + 1)
+        i = sample_tile[at, 0, None, None] + around[:, None]
+        j = sample_tile[at, 1, None, None] + around
+        inside = (i >= 0) & (i < grid_size_x) & (j >= 0) & (j < grid_size_y)
+        keys.append(((i * grid_size_y + j) * n + owner[leg[at], None, None])[inside])
+    tile_id, platform = np.divmod(np.unique(np.concatenate(keys)), n)
+    cut = np.flatnonzero(np.diff(tile_id)) + 1
+    tiles = {}
+    for t, group in zip(tile_id[np.r_[0, cut]].tolist() if len(tile_id) else [], np.split(platform, cut)):
+        tiles[divmod(t, grid_size_y)] = group.tolist()
+
+    return {
+        'points': points, 'next': nexts, 'heading': delta / length[:, None], 'length': length,
+        'first': first, 'start': np.array(start, dtype=np.float64).reshape(-1, 3),
+        'size': size, 'speed': speed,
+        'loop': np.add.reduceat(length, first) if len(first) else np.zeros(0),
+        'lowest': min(z for _, _, z in start) if start else 0.0,
+        'tiles': tiles,
+    }
+
+
+def load_platforms(platforms):
+    """Replace the level's platforms and put each on its first waypoint."""
+    s = state
+    s.platform_layout = layout = build_platform_layout(platforms)
+    s.platform_pos = layout['start'].copy()
+    s.platform_leg = layout['first'].copy()
+    s.platform_along = np.zeros(len(s.platform_leg))
+
+def advance_platforms(layout, leg, along, dt):
+    """Move platforms dt along their loops, updating leg and along (arrays of
+    any shape, as VecEnv stacks them) in place; returns their new (x, y)."""
+    along += layout['speed'] * dt
+    length = layout['length']
+    over = along >= length[leg]
+    if over.any():
+        np.fmod(along, layout['loop'], out=along)
+        over = along >= length[leg]
+        while over.any():  # waypoints closer than one tick's travel are passed in the same tick
+            along[over] -= length[leg[over]]
+            leg[over] = layout['next'][leg[over]]
+            over = along >= length[leg]
+    return layout['points'][leg] + layout['heading'][leg] * along[..., None]
+
+def blocked_tiles():
+    """Tiles enemies cannot enter: holes and tiles an obstacle is centred on."""
+    blocked = state.hole_map.copy()
+    for i, j in state.tile_obstacles:
+        blocked[i, j] = True
+    return blocked
+
+def build_flow_field(source):
+    """BFS from tile source over the unblocked tiles of its flow_box.
+
+    One NumPy pass per distance ring expands the whole frontier at once, on
+    a copy of the box's bitmap padded with blocked tiles so no neighbour
+    leaves it.  A tile's parent is its first frontier neighbour in the order
+    i - 1, i + 1, j - 1, j + 1.
+    """
+    si, sj = source
+    i0, i1 = max(0, si - flow_radius), min(grid_size_x, si + flow_radius + 1)
+    j0, j1 = max(0, sj - flow_radius), min(grid_size_y, sj + flow_radius + 1)
+    bx, by = i1 - i0, j1 - j0
+    py = by + 2  # padded row length
+    blocked = blocked_tiles()[i0:i1, j0:j1]
+    unseen = np.zeros((bx + 2, py), dtype=bool)
+    unseen[1:-1, 1:-1] = ~blocked
+    unseen = unseen.ravel()
+    dist = np.full(unseen.size, -1, dtype=np.int32)
+    parent = np.full(unseen.size, -1, dtype=np.int64)
+    s = (si - i0 + 1) * py + sj - j0 + 1
+    dist[s] = 0
+    parent[s] = s
+    unseen[s] = False
+    frontier = np.array([s])
+    d = 0
+    while len(frontier):
+        d += 1
+        reached = []
+        for offset in (-py, py, -1, 1):
+            n = frontier + offset
+            new = unseen[n]
+            n = n[new]
+            unseen[n] = False
+            parent[n] = frontier[new]
+            reached.append(n)
+        frontier = np.concatenate(reached)
+        dist[frontier] = d
+    # An enemy that followed the ball onto a blocked tile steps off it
+    pad = np.zeros((bx + 2, py), dtype=bool)
+    pad[1:-1, 1:-1] = blocked
+    stranded = np.flatnonzero(pad.ravel() & (parent < 0))
+    for offset in (-py, py, -1, 1):
+        n = stranded + offset
+        off = (dist[n] >= 0) & (parent[stranded] < 0)
+        parent[stranded[off]] = n[off]
+    # Padded box ids back to grid tile ids
+    state.flow_dist = dist.reshape(bx + 2, py)[1:-1, 1:-1].copy()
+    parent = parent.reshape(bx + 2, py)[1:-1, 1:-1].ravel()
+    pi, pj = np.divmod(parent, py)
+    state.flow_next = np.where(parent < 0, -1, (pi - 1 + i0) * grid_size_y + pj - 1 + j0).astype(np.int32)
+    state.flow_box = (i0, i1, j0, j1)
+    state.flow_tile = source
+
+def spawn_enemies():
+    """Place this level's enemies on random open tiles away from the ball."""
+    s = state
+    s.flow_tile = None
+    count = max(0, enemies_per_level * (s.level - 1)) * grid_size_x * grid_size_y // 600
+    count = min(count, max_enemies)
+    si, sj = tile_of(s.ball_pos[0], s.ball_pos[1])
+    i, j = np.divmod(np.arange(grid_size_x * grid_size_y), grid_size_y)
+    far = np.maximum(abs(i - si), abs(j - sj)) >= enemy_spawn_distance
+    candidates = np.flatnonzero(far & ~blocked_tiles().ravel())
+    chosen = candidates[random.sample(range(len(candidates)), min(count, len(candidates)))]
+    i, j = np.divmod(chosen, grid_size_y)
+    s.enemy_pos = np.column_stack((i * tile_size - half_size_x + tile_size / 2,
+                                   j * tile_size - half_size_y + tile_size / 2,
+                                   np.full(len(chosen), enemy_radius)))
+
+def move_enemies(dt):
+    """Step every enemy toward the centre of its tile's flow_next neighbour."""
+    s = state
+    ball_pos, enemy_pos = s.ball_pos, s.enemy_pos
+    tile = tile_of(ball_pos[0], ball_pos[1])
+    if tile != s.flow_tile:
+        build_flow_field(tile)
+    i = np.clip(((enemy_pos[:, 0] + half_size_x) // tile_size).astype(np.intp), 0, grid_size_x - 1)
+    j = np.clip(((enemy_pos[:, 1] + half_size_y) // tile_size).astype(np.intp), 0, grid_size_y - 1)
+    k = i * grid_size_y + j
+    # Outside the field's box an enemy steers as if on the ball's tile
+    i0, i1, j0, j1 = s.flow_box
+    inside = (i >= i0) & (i < i1) & (j >= j0) & (j < j1)
+    row = np.clip(i - i0, 0, i1 - i0 - 1) * (j1 - j0) + np.clip(j - j0, 0, j1 - j0 - 1)
+    nxt = np.where(inside, s.flow_next[row], k)
+    ni, nj = np.divmod(nxt, grid_size_y)
+    target = np.column_stack((ni * tile_size - half_size_x + tile_size / 2,
+                              nj * tile_size - half_size_y + tile_size / 2))
+    target[nxt == k] = ball_pos[:2]   # same tile: go straight for the ball
+    stuck = nxt < 0
+    target[stuck] = enemy_pos[stuck, :2]
+    d = target - enemy_pos[:, :2]
+    length = np.sqrt(np.einsum('ij,ij->i', d, d))
+    step = np.minimum((enemy_speed + s.level * enemy_level_speed) * dt, length)
+    enemy_pos[:, :2] += d * (step / np.maximum(length, 1e-9))[:, None]
+
+def collect_pickup(row):
+    s = state
+    s.pickup_active[row] = False
+    tile_pickups[tile_of(*s.pickup_pos[row, :2])].remove(row)
+    kind = s.pickup_kind[row]
+    value = float(s.pickup_value[row])
+    if kind == PICKUP_SPEED_BOOST:
+        s.speed_boost_active = True
+        s.speed_boost_timer = value
+        s.speed_multiplier *= 1.5
+    elif kind == PICKUP_SLOW_TRAP:
+        s.slow_trap_active = True
+        s.slow_trap_timer = value
+        s.speed_multiplier /= 2.0
+    elif kind == PICKUP_TIME_BONUS:
+        # reduce time spent on current tile
+        s.time_on_tile = max(0, s.time_on_tile - value)
+    elif kind == PICKUP_LIFE:
+        s.lives += 1
+    elif kind == PICKUP_MULTIPLIER:
+        s.multiplier_active = True
+        s.multiplier_timer = value
+        s.multiplier_factor = multiplier_bonus
+    elif kind == PICKUP_SHIELD:
+        s.shield_active = True
+        s.shield_time = value
+    elif kind == PICKUP_COLLECTIBLE:
+        s.score += 1 * s.multiplier_factor
+        s.goals_left -= 1
+    elif kind == PICKUP_SPECIAL:
+        s.score += 5 * s.multiplier_factor
+        s.goals_left -= 1
+
+def lose_life(cause):
+    s = state
+    s.life_losses.append(cause)
+    s.lives -= 1
+    if s.lives <= 0:
+        s.game_state = "game_over"
+    else:
+        reset_game(reset_score=False, reset_lives=False)
+
+def update(dt):
+    s = state
+    if s.game_state != "playing" or s.paused:
+        return
+
+    clock.advance(dt)
+    ball_pos, ball_vel = s.ball_pos, s.ball_vel
+
+    # Timers / power-ups
+    if s.speed_boost_active:
+        s.speed_boost_timer -= dt
+        if s.speed_boost_timer <= 0:
+            s.speed_boost_active = False
+            s.speed_multiplier /= 1.5
+
+    if s.slow_trap_active:
+        s.slow_trap_timer -= dt
+        if s.slow_trap_timer <= 0:
+            s.slow_trap_active = False
+            s.speed_multiplier *= 2.0
+
+    if s.multiplier_active:
+        s.multiplier_timer -= dt
+        if s.multiplier_timer <= 0:
+            s.multiplier_active = False
+            s.multiplier_factor = 1
+
+    if s.shield_active:
+        s.shield_time -= dt
+        if s.shield_time <= 0:
+            s.shield_active = False
+
+    # Movement (WASD standard axes)
+    move_keys = s.move_keys
+    move_dir = [
+        (-1 if move_keys['a'] else (1 if move_keys['d'] else 0)),  # x
+        (1 if move_keys['w'] else (-1 if move_keys['s'] else 0))   # y
+    ]
+    if move_dir[0] and move_dir[1]:
+        inv = 1.0 / math.sqrt(2.0)
+        move_dir[0] *= inv; move_dir[1] *= inv
+
+    base_speed = 200.0
+    ball_vel[0] = move_dir[0] * base_speed * s.speed_multiplier
+    ball_vel[1] = move_dir[1] * base_speed * s.speed_multiplier
+
+    # Jumping
+    on_ground = ball_pos[2] <= ball_radius + 0.001
+    if s.space_pressed and on_ground and not s.jumping:
+        s.jumping = True
+        s.jump_start_time = clock.now()
+        ball_vel[2] = jump_strength
+    if s.jumping and (not s.space_pressed or (clock.now() - s.jump_start_time) >= max_jump_duration):
+        s.jumping = False
+
+    # Gravity
+    ball_vel[2] += gravity * dt
+    start = tuple(ball_pos)  # collisions below test the path from here
+
+    # Integrate
+    ball_pos[0] += ball_vel[0] * dt
+    ball_pos[1] += ball_vel[1] * dt
+    ball_pos[2] += ball_vel[2] * dt
+
+    # Ground collision
+    if ball_pos[2] < ball_radius:
+        ball_pos[2] = ball_radius
+        ball_vel[2] = 0
+        s.jumping = False
+
+    # Walls
+    if ball_pos[0] < -half_size_x + ball_radius:
+        ball_pos[0] = -half_size_x + ball_radius; ball_vel[0] = -ball_vel[0] * 0.8
+    elif ball_pos[0] > half_size_x - ball_radius:
+        ball_pos[0] = half_size_x - ball_radius; ball_vel[0] = -ball_vel[0] * 0.8
+
+    if ball_pos[1] < -half_size_y + ball_radius:
+        ball_pos[1] = -half_size_y + ball_radius; ball_vel[1] = -ball_vel[1] * 0.8
+    elif ball_pos[1] > half_size_y - ball_radius:
+        ball_pos[1] = half_size_y - ball_radius; ball_vel[1] = -ball_vel[1] * 0.8
+
+    # Moving platforms: only those whose route passes the ball's tiles can hold it up
+    platform_pos, layout = s.platform_pos, s.platform_layout
+    if len(platform_pos):
+        near = []
+        if max(start[2], ball_pos[2]) > layout['lowest']:  # never lands from below a centre
+            near = sorted(set(nearby(layout['tiles'], start[0], start[1], ball_pos[0], ball_pos[1], 0)))
+        old = [platform_pos[k, :2].tolist() for k in near]
+        platform_pos[:, :2] = advance_platforms(layout, s.platform_leg, s.platform_along, dt)
+        size = layout['size']
+        carried = None
+        for k, (old_x, old_y) in zip(near, old):
+            pos, sk = platform_pos[k].tolist(), size[k].tolist()
+            if lands_on(start, ball_pos, pos, sk, old_x, old_y):
+                ball_pos[2] = pos[2] + sk[2] / 2 + ball_radius
+                ball_vel[2] = 0
+                s.jumping = False
+                carried = (pos[0] - old_x, pos[1] - old_y)
+        if carried is not None:
+            # The ball rides along with the (last) platform holding it up
+            ball_pos[0] += carried[0]
+            ball_pos[1] += carried[1]
+            ball_vel[0] += carried[0] / dt
+            ball_vel[1] += carried[1] / dt
+
+    # Teleporters
+    for pad, target in teleporters:
+        move = (ball_pos[0] - start[0], ball_pos[1] - start[1], ball_pos[2] - start[2])
+        if sweep_hit(start, move, pad, ball_radius + 15):
+            ball_pos[0], ball_pos[1], ball_pos[2] = target
+            start = tuple(ball_pos)  # the rest of the path was not travelled
+
+    # Obstacles: a shield absorbs the first hit, a second one still costs a life
+    move = (ball_pos[0] - start[0], ball_pos[1] - start[1], ball_pos[2] - start[2])
+    for k in nearby(s.tile_obstacles, start[0], start[1], ball_pos[0], ball_pos[1]):
+        if sweep_hit(start, move, s.obstacle_pos[k].tolist(), ball_radius + s.obstacle_size[k].item()):
+            if s.shield_active:
+                s.shield_active = False
+            else:
+                lose_life("obstacle")
+                start = tuple(ball_pos)
+                break
+
+    # Enemies
+    if len(s.enemy_pos):
+        move_enemies(dt)
+        # Swept like obstacles, against where the enemies ended the tick
+        f = s.enemy_pos - start
+        move = np.subtract(ball_pos, start)
+        t = np.minimum(np.maximum(f @ move / (move @ move or 1.0), 0.0), 1.0)
+        d = f - t[:, None] * move
+        if (np.einsum('ij,ij->i', d, d) < (ball_radius + enemy_radius) ** 2).any():
+            if s.shield_active:
+                s.shield_active = False
+            else:
+                lose_life("enemy")
+                start = tuple(ball_pos)
+
+    # Power-ups, collectibles and special points along the path
+    rows = nearby(tile_pickups, start[0], start[1], ball_pos[0], ball_pos[1])
+    if rows:
+        move = (ball_pos[0] - start[0], ball_pos[1] - start[1], ball_pos[2] - start[2])
+        hit = [row for row in sorted(rows)
+               if sweep_hit(start, move, s.pickup_pos[row].tolist(), s.pickup_radius[row] + ball_radius)]
+        for row in hit:
+            collect_pickup(row)
+
+    # Holes
+    hole_map = s.hole_map
+    i, j = tile_of(ball_pos[0], ball_pos[1])
+    if 0 <= i < grid_size_x and 0 <= j < grid_size_y and ball_pos[2] <= ball_radius + 1:
+        if hole_map[i, j]:
+            if s.shield_active:
+                s.shield_active = False
+            else:
+                lose_life("hole")
+
+    # Tile timer (discourage camping)
+    if 0 <= i < grid_size_x and 0 <= j < grid_size_y and not hole_map[i, j]:
+        if ball_pos[2] <= ball_radius + 1:
+            if (i, j) == s.last_tile:
+                s.time_on_tile += dt
+                s.show_timer = True
+                if s.time_on_tile >= max_tile_time:
+                    s.time_on_tile = 0.0
+                    s.last_tile = None
+                    s.show_timer = False
+                    lose_life("tile_timer")
+            else:
+                s.last_tile = (i, j)
+                s.time_on_tile = 0.0
+                s.show_timer = True
+    else:
+        s.last_tile = None
+        s.time_on_tile = 0.0
+        s.show_timer = False
+
+    # Win condition
+    if s.goals_left == 0:
+        if s.level < max_level:
+            s.level += 1
+            reset_game(reset_score=False, reset_lives=False)
+        else:
+            s.game_state = "win"
+
+    # Ball color by power-ups
+    ball_color = s.ball_color
+    if s.speed_boost_active:
+        ball_color[:] = [0.0, 0.0, 1.0]
+    elif s.slow_trap_active:
+        ball_color[:] = [1.0, 0.0, 1.0]
+    elif s.multiplier_active:
+        ball_color[:] = [1.0, 1.0, 0.0]
+    elif s.shield_active:
+        ball_color[:] = [0.0, 1.0, 1.0]
+    else:
+        ball_color[:] = [1.0, 0.2, 0.2]
+
+# ---------------------------
+# Fixed timestep
+# ---------------------------
+# advance(frame_dt) runs update() in fixed ticks of 1 / tick_rate seconds.
+# Leftover time (state.accumulator) carries to the next frame;
+# state.render_alpha says how far the frame sits between the last two ticks
+# so the renderer can interpolate from the prev_* positions.
+tick_rate = 120
+max_catch_up_steps = 30  # ticks per frame before the backlog is dropped
+
+def save_render_state():
+    s = state
+    s.prev_ball_pos[:] = s.ball_pos
+    if s.prev_platform_pos.shape == s.platform_pos.shape:
+        s.prev_platform_pos[:] = s.platform_pos
+    else:
+        s.prev_platform_pos = s.platform_pos.copy()
+    if s.prev_enemy_pos.shape == s.enemy_pos.shape:
+        s.prev_enemy_pos[:] = s.enemy_pos
+    else:
+        s.prev_enemy_pos = s.enemy_pos.copy()
+
+def advance(frame_dt):
+    """Run the fixed ticks that frame_dt of wall time covers; returns the tick count."""
+    s = state
+    if s.game_state != "playing" or s.paused:
+        s.accumulator = 0.0
+        s.render_alpha = 1.0
+        return 0
+    dt = 1.0 / tick_rate
+    s.accumulator += frame_dt
+    steps = 0
+    while s.accumulator >= dt:
+        if steps == max_catch_up_steps:
+            # Too far behind (stall, window drag): drop the backlog
+            s.accumulator %= dt
+            break
+        save_render_state()
+        tick(dt)
+        s.accumulator -= dt
+        steps += 1
+    s.render_alpha = s.accumulator / dt
+    return steps
+
+def lerp_pos(prev, cur):
+    # Teleports and respawns jump more than a tile; don't smear across them
+    if abs(cur[0] - prev[0]) + abs(cur[1] - prev[1]) > tile_size:
+        return list(cur)
+    return [p + (c - p) * state.render_alpha for p, c in zip(prev, cur)]
+
+def render_ball_pos():
+    return lerp_pos(state.prev_ball_pos, state.ball_pos)
+
+def lerp_positions(prev, cur):
+    """lerp_pos() for (n, 3) arrays: what jumped (respawns) is shown where it is."""
+    if prev.shape != cur.shape:
+        return cur
+    pos = prev + (cur - prev) * state.render_alpha
+    jumped = np.abs(cur[:, :2] - prev[:, :2]).sum(axis=1) > tile_size
+    pos[jumped] = cur[jumped]
+    return pos
+
+def render_platform_pos():
+    return lerp_positions(state.prev_platform_pos, state.platform_pos)
+
+def render_enemy_pos():
+    return lerp_positions(state.prev_enemy_pos, state.enemy_pos)
+
+# ---------------------------
+# Ticks, commands, recording
+# ---------------------------
+# Everything that changes game state goes through tick() or command(), so a
+# recorder (see replay.py) can log it and a replay can reproduce it exactly.
+recorder = None  # object with on_tick() and on_command(name), or None
+history = None   # object whose on_tick() runs after each tick (rewind.History), or None
+
+def tick(dt):
+    if recorder is not None:
+        recorder.on_tick()
+    update(dt)
+    state.tick_count += 1
+    if history is not None:
+        history.on_tick()
+
+def command(name):
+    """Apply a player command: "reset", "pause", "menu" or "help"."""
+    if recorder is not None:
+        recorder.on_command(name)
+    if name == "reset":
+        reset_game()
+    elif name == "pause":
+        state.paused = not state.paused
+    elif name in ("menu", "help"):
+        state.game_state = name
+    else:
+        raise ValueError(f"unknown command {name!r}")
+
+def state_hash():
+    """CRC32 of the state a replay must reproduce tick for tick."""
+    s = state
+    packed = struct.pack('<8d6i', *s.ball_pos, *s.ball_vel, s.speed_multiplier, s.time_on_tile,
+                         s.score, s.lives, s.level, s.goals_left, grid_size_x, grid_size_y)
+    return zlib.crc32(s.game_state.encode(), zlib.crc32(packed))
+
+# ---------------------------
+# Snapshots
+# ---------------------------
+# clone() copies the state, which shares the level layouts (see GameState),
+# and adds the clock time and RNG state; restore() copies it back, for
+# lookahead search or rollback.  Grid size and recorder are not saved.
+def clone():
+    """Snapshot the running game in O(size of the mutable state)."""
+    saved = state.copy()
+    saved.clock_time = clock.now()
+    saved.rng_state = random.getstate()
+    return saved
+
+def restore(saved):
+    """Make the game exactly as it was when saved was cloned."""
+    if saved.holes_version == state.holes_version and saved.hole_map.shape == state.hole_map.shape:
+        # Same layout with set_hole() edits: tell the renderer which tiles flip
+        hole_changes.extend(map(tuple, np.argwhere(saved.hole_map != state.hole_map).tolist()))
+    state.assign(saved)
+    clock.set(saved.clock_time)
+    random.setstate(saved.rng_state)
+    build_pickup_hash()
+
+# ---------------------------
+# Headless driving
+# ---------------------------
+def start(seed=None, start_level=1):
+    """Seed the RNG and begin a fresh run at start_level."""
+    s = state
+    if seed is not None:
+        random.seed(seed)
+    clock.set(0.0)
+    s.tick_count = 0
+    s.level = start_level
+    s.high_score = 0
+    s.paused = False
+    s.move_keys.update(a=False, d=False, w=False, s=False)
+    set_input(space=False)
+    reset_game()
+
+def set_input(keys=None, space=None):
+    move_keys = state.move_keys
+    if keys is not None:
+        for k in move_keys:
+            move_keys[k] = k in keys
+    if space is not None:
+        state.space_pressed = space
+
+def fast_forward(seconds, dt=1.0 / 60.0, policy=None):
+    """Step tick(dt) until `seconds` of game time pass or the run ends.
+
+    policy, if given, is called before each step and may call set_input().
+    Returns the number of steps taken.
+    """
+    steps = 0
+    for _ in range(int(round(seconds / dt))):
+        if state.game_state != "playing":
+            break
+        if policy is not None:
+            policy()
+        tick(dt)
+        steps += 1
+    return steps
@@ -0,0 +1,471 @@
+"""Batched Sphere Quest: N independent games stepped together with NumPy.
+
+VecEnv keeps every game's state in stacked arrays (ball, hole bitmaps,
+pickup masks, power-up timers, lives, score) and advances all of them with
+one step() call that applies sim.update()'s rules in the same order.  Games
+that end are given a fresh level in the same call, so every game is always
+playing.
+
+    env = VecEnv(4096, seed=1)
+    reward, done = env.step(actions)  # actions: replay.KEY_BITS | SPACE_BIT masks
+    obs = env.observe()               # (n, len(OBS_FIELDS)) float32
+
+Levels come from the VecEnv's own NumPy generator rather than sim's `random`
+stream, so a seed gives different layouts than sim.start(seed).
+copy_from_sim() loads sim's current game into one slot instead.
+
+Enemies are not modelled: VecEnv follows sim's rules with
+sim.enemies_per_level = 0, and copy_from_sim() refuses games that have any.
+Every game has the moving platforms of start_level (sim.level_platforms).
+"""
+import math
+
+import numpy as np
+
+import sim
+from replay import KEY_BITS, SPACE_BIT
+
+PLAYING, GAME_OVER, WIN = range(3)
+OBS_FIELDS = ("x", "y", "z", "vx", "vy", "vz", "lives", "level", "goals_left",
+              "time_on_tile", "speed_multiplier", "shield_time")
+
+class VecEnv:
+    """n games on sim's current grid, all starting at start_level."""
+
+    def __init__(self, n, seed=None, start_level=1, dt=None):
+        self.n = n
+        self.start_level = start_level
+        self.dt = 1.0 / sim.tick_rate if dt is None else dt
+        self.rng = np.random.default_rng(seed)
+        self.gx, self.gy = sim.grid_size_x, sim.grid_size_y
+        self.half_x, self.half_y = sim.half_size_x, sim.half_size_y
+        i, j = self.gx // 2, self.gy // 2
+        # Holes are never generated near the centre, so it is always the start tile
+        self.start_pos = np.array([i * sim.tile_size - self.half_x + sim.tile_size / 2,
+                                   j * sim.tile_size - self.half_y + sim.tile_size / 2,
+                                   sim.ball_radius])
+        allowed = np.ones((self.gx, self.gy), dtype=bool)
+        allowed[max(0, i - 3):i + 4, max(0, j - 3):j + 4] = False
+        self.allowed = allowed.ravel()
+
+        level = start_level
+        self.num_holes = min(min(30 + level * 3, 150) * self.gx * self.gy // 600,
+                             int(self.allowed.sum()))
+        self.num_collectibles = 15 + level * 2
+        self.num_specials = 5 + level
+        self.num_obstacles = min(5 + level * 2, 20)
+        if self.num_collectibles + self.num_specials > self.gx * self.gy - self.num_holes:
+            raise ValueError("grid too small for this level's collectibles")
+
+        # Per-row pickup constants shared by every game, in sim.build_pickups() row order
+        kinds = [kind for kind, _, _ in sim.power_ups]
+        self.num_power_ups = len(kinds)
+        kinds += [sim.PICKUP_COLLECTIBLE] * self.num_collectibles + [sim.PICKUP_SPECIAL] * self.num_specials
+        self.pickup_kind = np.array(kinds, dtype=np.int8)
+        self.pickup_radius = np.array(sim.PICKUP_RADIUS, dtype=np.float64)[self.pickup_kind]
+        self.pickup_reach = self.pickup_radius + sim.ball_radius
+        self.pickup_value = np.array([value for _, _, value in sim.power_ups], dtype=np.float64)
+        self.power_up_pos = np.array([pos for _, pos, _ in sim.power_ups], dtype=np.float64).reshape(-1, 3)
+        p = len(kinds)
+
+        self.platforms = sim.build_platform_layout(sim.level_platforms.get(level, sim.default_platforms))
+        m = len(self.platforms['size'])
+        self.teleporters = [(np.array(pad, dtype=np.float64), target) for pad, target in sim.teleporters]
+
+        # Game state, one row per game
+        self.ball_pos = np.zeros((n, 3))
+        self.ball_vel = np.zeros((n, 3))
+        self.jumping = np.zeros(n, dtype=bool)
+        self.jump_start_time = np.zeros(n)
+        self.clock = np.zeros(n)
+        self.score = np.zeros(n, dtype=np.int64)
+        self.lives = np.zeros(n, dtype=np.int64)
+        self.level = np.zeros(n, dtype=np.int64)
+        self.state = np.zeros(n, dtype=np.int8)
+        self.speed_multiplier = np.zeros(n)
+        self.speed_boost_timer = np.zeros(n)
+        self.speed_boost_active = np.zeros(n, dtype=bool)
+        self.slow_trap_timer = np.zeros(n)
+        self.slow_trap_active = np.zeros(n, dtype=bool)
+        self.multiplier_timer = np.zeros(n)
+        self.multiplier_active = np.zeros(n, dtype=bool)
+        self.multiplier_factor = np.zeros(n, dtype=np.int64)
+        self.shield_time = np.zeros(n)
+        self.shield_active = np.zeros(n, dtype=bool)
+        self.last_tile = np.zeros(n, dtype=np.int64)  # i * gy + j, -1 for none
+        self.time_on_tile = np.zeros(n)
+        self.show_timer = np.zeros(n, dtype=bool)
+        self.goals_left = np.zeros(n, dtype=np.int64)
+        self.hole_map = np.zeros((n, self.gx, self.gy), dtype=bool)
+        self.pickup_pos = np.zeros((n, p, 3))
+        self.pickup_active = np.zeros((n, p), dtype=bool)
+        self.obstacle_pos = np.zeros((n, self.num_obstacles, 3))
+        self.obstacle_size = np.zeros((n, self.num_obstacles))
+        self.platform_pos = np.zeros((n, m, 3))
+        self.platform_leg = np.zeros((n, m), dtype=np.int64)
+        self.platform_along = np.zeros((n, m))
+
+        # Results of the games that ended in the last step()
+        self.final_score = np.zeros(n, dtype=np.int64)
+        self.final_level = np.zeros(n, dtype=np.int64)
+        self.final_state = np.zeros(n, dtype=np.int8)
+        self.episodes = 0
+
+        self.reset()
+
+    # ---------------------------
+    # Resets
+    # ---------------------------
+    def reset(self):
+        """Start a new game in every slot; returns observe()."""
+        self.new_games(np.arange(self.n))
+        return self.observe()
+
+    def new_games(self, idx):
+        """Generate fresh levels for games idx, like sim.start() + reset_game()."""
+        k = len(idx)
+        if k == 0:
+            return
+        rng = self.rng
+        n_tiles = self.gx * self.gy
+        holes = self.hole_map.reshape(self.n, n_tiles)
+
+        # Holes: num_holes distinct allowed tiles per game
+        keys = rng.random((k, n_tiles))
+        keys[:, ~self.allowed] = 2.0
+        rows = np.zeros((k, n_tiles), dtype=bool)
+        if self.num_holes:
+            chosen = np.argpartition(keys, self.num_holes - 1, axis=1)[:, :self.num_holes]
+            np.put_along_axis(rows, chosen, True, axis=1)
+        holes[idx] = rows
+
+        # Collectibles then stars on distinct non-hole tiles
+        keys = rng.random((k, n_tiles))
+        keys[rows] = 2.0
+        tiles = np.argsort(keys, axis=1)[:, :self.num_collectibles + self.num_specials]
+        ti, tj = np.divmod(tiles, self.gy)
+        p0 = self.num_power_ups
+        pos = self.pickup_pos[idx]
+        pos[:, :p0] = self.power_up_pos
+        pos[:, p0:, 0] = ti * sim.tile_size - self.half_x + sim.tile_size / 2
+        pos[:, p0:, 1] = tj * sim.tile_size - self.half_y + sim.tile_size / 2
+        pos[:, p0:, 2] = 15
+        self.pickup_pos[idx] = pos
+        self.pickup_active[idx] = True
+        self.goals_left[idx] = self.num_collectibles + self.num_specials
+
+        m = self.num_obstacles
+        obstacles = np.empty((k, m, 3))
+        obstacles[:, :, 0] = rng.uniform(-self.half_x + 50, self.half_x - 50, (k, m))
+        obstacles[:, :, 1] = rng.uniform(-self.half_y + 50, self.half_y - 50, (k, m))
+        obstacles[:, :, 2] = 30
+        self.obstacle_pos[idx] = obstacles
+        self.obstacle_size[idx] = rng.uniform(15, 30, (k, m))
+
+        self.clock[idx] = 0.0
+        self.score[idx] = 0
+        self.lives[idx] = 3
+        self.level[idx] = self.start_level
+        self.speed_boost_active[idx] = False
+        self.speed_boost_timer[idx] = 0.0
+        self.slow_trap_active[idx] = False
+        self.slow_trap_timer[idx] = 0.0
+        self.multiplier_active[idx] = False
+        self.multiplier_timer[idx] = 0.0
+        self.multiplier_factor[idx] = 1
+        self.shield_active[idx] = False
+        self.shield_time[idx] = 0.0
+        self.platform_pos[idx] = self.platforms['start']
+        self.platform_leg[idx] = self.platforms['first']
+        self.platform_along[idx] = 0.0
+        mask = np.zeros(self.n, dtype=bool)
+        mask[idx] = True
+        self.respawn(mask)
+
+    def respawn(self, mask):
+        """sim.reset_game(reset_score=False, reset_lives=False) for games in mask."""
+        self.ball_pos[mask] = self.start_pos
+        self.ball_vel[mask] = 0.0
+        self.jumping[mask] = False
+        self.jump_start_time[mask] = 0.0
+        self.last_tile[mask] = -1
+        self.time_on_tile[mask] = 0.0
+        self.show_timer[mask] = False
+        self.speed_multiplier[mask] = 1.0 + self.level[mask] * 0.1
+        self.state[mask] = PLAYING
+
+    def lose_life(self, mask):
+        self.lives[mask] -= 1
+        over = mask & (self.lives <= 0)
+        self.state[over] = GAME_OVER
+        self.respawn(mask & ~over)
+
+    def copy_from_sim(self, e):
+        """Load sim's current game into slot e (its level must match start_level)."""
+        s = sim.state
+        if len(s.pickup_kind) != len(self.pickup_kind) or len(s.obstacle_pos) != self.num_obstacles:
+            raise ValueError("sim's level has a different layout size; start it at start_level")
+        if len(s.enemy_pos):
+            raise ValueError("VecEnv does not model enemies; set sim.enemies_per_level = 0")
+        if not np.array_equal(s.platform_layout['points'], self.platforms['points']):
+            raise ValueError("sim's level has different platforms; start it at start_level")
+        self.hole_map[e] = s.hole_map
+        self.pickup_pos[e] = s.pickup_pos
+        self.pickup_active[e] = s.pickup_active
+        self.obstacle_pos[e] = s.obstacle_pos
+        self.obstacle_size[e] = s.obstacle_size
+        self.platform_pos[e] = s.platform_pos
+        self.platform_leg[e] = s.platform_leg
+        self.platform_along[e] = s.platform_along
+        self.ball_pos[e] = s.ball_pos
+        self.ball_vel[e] = s.ball_vel
+        self.jumping[e] = s.jumping
+        self.jump_start_time[e] = s.jump_start_time
+        self.clock[e] = sim.clock.now()
+        for name in ("score", "lives", "level", "speed_multiplier", "speed_boost_timer",
+                     "speed_boost_active", "slow_trap_timer", "slow_trap_active",
+                     "multiplier_timer", "multiplier_active", "multiplier_factor",
+                     "shield_time", "shield_active", "time_on_tile", "show_timer", "goals_left"):
+            getattr(self, name)[e] = getattr(s, name)
+        self.last_tile[e] = -1 if s.last_tile is None else s.last_tile[0] * self.gy + s.last_tile[1]
+        self.state[e] = {"playing": PLAYING, "game_over": GAME_OVER, "win": WIN}[s.game_state]
+
+    # ---------------------------
+    # Stepping
+    # ---------------------------
+    def step(self, actions):
+        """Advance every game one tick with per-game input bitmasks.
+
+        Returns (reward, done): score gained this tick and whether the game
+        ended.  Ended games are already replaced by new ones; their results
+        are in final_score / final_level / final_state.
+        """
+        actions = np.asarray(actions)
+        score_before = self.score.copy()
+        self.update(actions)
+
+        reward = self.score - score_before
+        done = self.state != PLAYING
+        if done.any():
+            idx = np.flatnonzero(done)
+            self.final_score[idx] = self.score[idx]
+            self.final_level[idx] = self.level[idx]
+            self.final_state[idx] = self.state[idx]
+            self.episodes += len(idx)
+            self.new_games(idx)
+        return reward, done
+
+    def update(self, actions):
+        """One tick of sim.update() for every game, in the same order."""
+        dt = self.dt
+        r = sim.ball_radius
+        pos, vel = self.ball_pos, self.ball_vel
+        x, y, z = pos[:, 0], pos[:, 1], pos[:, 2]
+        self.clock += dt
+
+        # Timers / power-ups
+        boost = self.speed_boost_active
+        self.speed_boost_timer[boost] -= dt
+        ended = boost & (self.speed_boost_timer <= 0)
+        boost[ended] = False
+        self.speed_multiplier[ended] /= 1.5
+
+        slow = self.slow_trap_active
+        self.slow_trap_timer[slow] -= dt
+        ended = slow & (self.slow_trap_timer <= 0)
+        slow[ended] = False
+        self.speed_multiplier[ended] *= 2.0
+
+        mult = self.multiplier_active
+        self.multiplier_timer[mult] -= dt
+        ended = mult & (self.multiplier_timer <= 0)
+        mult[ended] = False
+        self.multiplier_factor[ended] = 1
+
+        shield = self.shield_active
+        self.shield_time[shield] -= dt
+        shield[shield & (self.shield_time <= 0)] = False
+
+        # Movement (WASD standard axes)
+        a, d = (actions & KEY_BITS['a']) != 0, (actions & KEY_BITS['d']) != 0
+        w, s = (actions & KEY_BITS['w']) != 0, (actions & KEY_BITS['s']) != 0
+        space = (actions & SPACE_BIT) != 0
+        mx = np.where(a, -1.0, np.where(d, 1.0, 0.0))
+        my = np.where(w, 1.0, np.where(s, -1.0, 0.0))
+        diagonal = (mx != 0) & (my != 0)
+        inv = 1.0 / math.sqrt(2.0)
+        mx[diagonal] *= inv
+        my[diagonal] *= inv
+        base_speed = 200.0
+        vel[:, 0] = mx * base_speed * self.speed_multiplier
+        vel[:, 1] = my * base_speed * self.speed_multiplier
+
+        # Jumping
+        on_ground = z <= r + 0.001
+        start = space & on_ground & ~self.jumping
+        self.jumping[start] = True
+        self.jump_start_time[start] = self.clock[start]
+        vel[start, 2] = sim.jump_strength
+        self.jumping &= space & (self.clock - self.jump_start_time < sim.max_jump_duration)
+
+        # Gravity, integrate, ground; collisions test the path from start
+        vel[:, 2] += sim.gravity * dt
+        start = pos.copy()
+        pos += vel * dt
+        landed = z < r
+        z[landed] = r
+        vel[landed, 2] = 0
+        self.jumping[landed] = False
+
+        # Walls
+        for axis, half in ((0, self.half_x), (1, self.half_y)):
+            c = pos[:, axis]
+            low = c < -half + r
+            high = ~low & (c > half - r)
+            c[low] = -half + r
+            c[high] = half - r
+            bounced = low | high
+            vel[bounced, axis] = -vel[bounced, axis] * 0.8
+
+        # Moving platforms, all of them at once; the ball rides the last one holding it up
+        layout = self.platforms
+        old = self.platform_pos[:, :, :2].copy()
+        self.platform_pos[:, :, :2] = sim.advance_platforms(layout, self.platform_leg, self.platform_along, dt)
+        # Only platforms some ball passes within reach of (plus a unit for
+        # rounding) are tested one by one, in order, as sim does
+        size = layout['size']
+        reach = np.abs(start[:, None, :2] - pos[:, None, :2]) / 2 + size[:, :2] / 2 + r + 1.0
+        mid = (start[:, None, :2] + pos[:, None, :2]) / 2
+        near = (np.abs(mid - self.platform_pos[:, :, :2]) < reach + np.abs(self.platform_pos[:, :, :2] - old)).all(axis=2)
+        carrier = np.full(self.n, -1)
+        for k in np.flatnonzero(near.any(axis=0)).tolist():
+            ppos = self.platform_pos[:, k]
+            old_x, old_y = old[:, k, 0], old[:, k, 1]
+            sx, sy, sz = size[k]
+            on = ((np.abs(x - ppos[:, 0]) < sx / 2 + r) &
+                  (np.abs(y - ppos[:, 1]) < sy / 2 + r) &
+                  (np.abs(z - ppos[:, 2]) < sz / 2 + r) &
+                  (z > ppos[:, 2]))
+            # Or crossed the top face while over it (sim.lands_on)
+            top = ppos[:, 2] + sz / 2 + r
+            e = np.flatnonzero(~on & (start[:, 2] >= top) & (top > z))
+            if len(e):
+                f = (start[e, 2] - top[e]) / (start[e, 2] - z[e])
+                rx = (start[e, 0] - old_x[e]) + f * ((x[e] - ppos[e, 0]) - (start[e, 0] - old_x[e]))
+                ry = (start[e, 1] - old_y[e]) + f * ((y[e] - ppos[e, 1]) - (start[e, 1] - old_y[e]))
+                on[e] = (np.abs(rx) < sx / 2 + r) & (np.abs(ry) < sy / 2 + r)
+            z[on] = ppos[on, 2] + sz / 2 + r
+            vel[on, 2] = 0
+            self.jumping[on] = False
+            carrier[on] = k
+        e = np.flatnonzero(carrier >= 0)
+        if len(e):
+            carried = self.platform_pos[e, carrier[e], :2] - old[e, carrier[e]]
+            pos[e, :2] += carried
+            vel[e, :2] += carried / dt
+
+        # Teleporters
+        for tele_pos, target in self.teleporters:
+            hit = sim.sweep_hits(start, pos - start, tele_pos, r + 15)
+            pos[hit] = target
+            start[hit] = target
+
+        # Obstacles: a shield absorbs the first hit of a tick, a second one still costs a life
+        move = (pos - start)[:, None, :]
+        hits = np.count_nonzero(sim.sweep_hits(start[:, None, :], move, self.obstacle_pos,
+                                               r + self.obstacle_size), axis=1)
+        shielded = self.shield_active.copy()
+        self.shield_active[shielded & (hits > 0)] = False
+        died = hits > shielded
+        self.lose_life(died)
+        start[died] = pos[died]
+
+        # Power-ups, collectibles and special points
+        hit = self.pickup_active & sim.sweep_hits(start[:, None, :], (pos - start)[:, None, :],
+                                                  self.pickup_pos, self.pickup_reach)
+        if hit.any():
+            self.collect(hit)
+
+        # Holes
+        i = ((x + self.half_x) // sim.tile_size).astype(np.int64)
+        j = ((y + self.half_y) // sim.tile_size).astype(np.int64)
+        inside = (i >= 0) & (i < self.gx) & (j >= 0) & (j < self.gy)
+        hole = inside & self.hole_map[np.arange(self.n), np.clip(i, 0, self.gx - 1), np.clip(j, 0, self.gy - 1)]
+        fell = hole & (z <= r + 1)
+        absorbed = fell & self.shield_active
+        self.shield_active[absorbed] = False
+        self.lose_life(fell & ~absorbed)
+
+        # Tile timer (discourage camping)
+        tile = i * self.gy + j
+        grounded = inside & ~hole & (z <= r + 1)
+        same = grounded & (tile == self.last_tile)
+        moved = grounded & ~same
+        self.time_on_tile[same] += dt
+        self.show_timer[grounded] = True
+        expired = same & (self.time_on_tile >= sim.max_tile_time)
+        self.last_tile[moved] = tile[moved]
+        self.time_on_tile[moved] = 0.0
+        off = ~(inside & ~hole) | expired
+        self.last_tile[off] = -1
+        self.time_on_tile[off] = 0.0
+        self.show_timer[off] = False
+        self.lose_life(expired)
+
+        # Win condition
+        cleared = self.goals_left == 0
+        if cleared.any():
+            self.state[cleared & (self.level >= sim.max_level)] = WIN
+            up = cleared & (self.level < sim.max_level)
+            self.level[up] += 1
+            self.respawn(up)
+
+    def collect(self, hit):
+        """Apply sim.collect_pickup() for every hit, in pickup row order."""
+        self.pickup_active &= ~hit
+        p0 = self.num_power_ups
+        for row in np.flatnonzero(hit[:, :p0].any(axis=0)):
+            e = hit[:, row]
+            kind = self.pickup_kind[row]
+            value = self.pickup_value[row]
+            if kind == sim.PICKUP_SPEED_BOOST:
+                self.speed_boost_active[e] = True
+                self.speed_boost_timer[e] = value
+                self.speed_multiplier[e] *= 1.5
+            elif kind == sim.PICKUP_SLOW_TRAP:
+                self.slow_trap_active[e] = True
+                self.slow_trap_timer[e] = value
+                self.speed_multiplier[e] /= 2.0
+            elif kind == sim.PICKUP_TIME_BONUS:
+                self.time_on_tile[e] = np.maximum(0, self.time_on_tile[e] - value)
+            elif kind == sim.PICKUP_LIFE:
+                self.lives[e] += 1
+            elif kind == sim.PICKUP_MULTIPLIER:
+                self.multiplier_active[e] = True
+                self.multiplier_timer[e] = value
+                self.multiplier_factor[e] = sim.multiplier_bonus
+            elif kind == sim.PICKUP_SHIELD:
+                self.shield_active[e] = True
+                self.shield_time[e] = value
+        p1 = p0 + self.num_collectibles
+        collected = np.count_nonzero(hit[:, p0:p1], axis=1)
+        stars = np.count_nonzero(hit[:, p1:], axis=1)
+        self.score += (collected + 5 * stars) * self.multiplier_factor
+        self.goals_left -= collected + stars
+
+    # ---------------------------
+    # Observations
+    # ---------------------------
+    def observe(self, out=None):
+        """State vectors (n, len(OBS_FIELDS)) float32, in OBS_FIELDS order."""
+        if out is None:
+            out = np.empty((self.n, len(OBS_FIELDS)), dtype=np.float32)
+        out[:, 0:3] = self.ball_pos
+        out[:, 3:6] = self.ball_vel
+        out[:, 6] = self.lives
+        out[:, 7] = self.level
+        out[:, 8] = self.goals_left
+        out[:, 9] = self.time_on_tile
+        out[:, 10] = self.speed_multiplier
+        out[:, 11] = self.shield_time * self.shield_active
+        return out